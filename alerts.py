@@ -0,0 +1,242 @@
+# alerts.py
+"""
+Anomaly alerts on the daily stats.
+
+Three kinds of checks run over every stat column:
+
+* robust z-score — each day against the median / median absolute deviation
+  of the WINDOW days before it (|z| ≥ Z_THRESHOLD flags it);
+* dropped to zero — a 0 after a non-zero day where that baseline median is
+  positive (skipped for LOWER_IS_BETTER stats);
+* threshold rules — user rules from alert_rules.json, e.g.
+  [{"stat": "Total Adspend", "op": ">", "value": 5000}].
+
+Only dates whose values changed since the last run (and the WINDOW days whose
+baseline includes them) are re-evaluated; a per-date row hash in
+alerts_state.json tracks what was seen. Findings go to alerts_log.csv, which
+the dashboard shows.
+
+The dashboard runs this in a background thread after every save; lead
+ingestion and imports run it after they save.
+
+    python alerts.py              # incremental pass
+    python alerts.py --backfill   # re-evaluate the whole history
+"""
+import argparse
+import json
+import os
+import threading
+import warnings
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from rpl_stats.conditions import LOWER_IS_BETTER
+from rpl_stats.stats_store import BASE_DIR, load_data, to_numeric_stat
+
+ALERTS_FILE = BASE_DIR / "alerts_log.csv"
+STATE_FILE = BASE_DIR / "alerts_state.json"
+RULES_FILE = BASE_DIR / "alert_rules.json"
+
+WINDOW = 28          # baseline days before each date
+MIN_HISTORY = 14     # baseline days with values needed for a z-score
+Z_THRESHOLD = 3.5
+
+ALERT_COLUMNS = ["Date", "Statistic", "Check", "Value", "Detail", "Detected at"]
+
+OPS = {
+    ">": np.greater, ">=": np.greater_equal,
+    "<": np.less, "<=": np.less_equal,
+    "==": np.equal,
+}
+
+
+# =========================================================
+#                  RULES / STATE / LOG FILES
+# =========================================================
+
+def load_rules() -> List[Dict]:
+    """User threshold rules from alert_rules.json."""
+    if RULES_FILE.exists():
+        try:
+            return json.loads(RULES_FILE.read_text())
+        except Exception:
+            pass
+    return []
+
+
+def load_state() -> Dict[str, str]:
+    """{date: row hash} as of the last evaluation."""
+    if STATE_FILE.exists():
+        try:
+            return json.loads(STATE_FILE.read_text())
+        except Exception:
+            pass
+    return {}
+
+
+def save_state(state: Dict[str, str]) -> None:
+    STATE_FILE.write_text(json.dumps(state))
+
+
+def load_alerts() -> pd.DataFrame:
+    """The alerts log, newest date first."""
+    if not ALERTS_FILE.exists():
+        return pd.DataFrame(columns=ALERT_COLUMNS)
+    log = pd.read_csv(ALERTS_FILE, parse_dates=["Date"])
+    return log.sort_values(["Date", "Statistic"], ascending=[False, True]).reset_index(drop=True)
+
+
+# =========================================================
+#                     VECTORISED CHECKS
+# =========================================================
+
+def _numeric_block(df: pd.DataFrame):
+    """(dates, stat names, float values (days × stats)) sorted by Date."""
+    df = df.dropna(subset=["Date"]).sort_values("Date")
+    stats = [c for c in df.columns if c != "Date"]
+    values = np.column_stack([to_numeric_stat(df[c]).to_numpy(dtype=float) for c in stats])
+    return pd.DatetimeIndex(df["Date"]), stats, values
+
+
+def robust_z(values: np.ndarray, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Robust z-scores (0.6745 · (x − median) / MAD) for the rows at `positions`,
+    each against the WINDOW rows before it, plus those baseline medians.
+    When the MAD is 0 the mean absolute deviation stands in for it
+    ((x − median) / (1.2533 · MeanAD)); z is NaN where the baseline is too
+    short or completely flat.
+    """
+    padded = np.vstack([np.full((WINDOW, values.shape[1]), np.nan), values])
+    # windows[p] = the WINDOW rows before original row p → (k, stats, WINDOW)
+    windows = sliding_window_view(padded, WINDOW, axis=0)[positions]
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN windows
+        med = np.nanmedian(windows, axis=2)
+        dev = np.abs(windows - med[..., None])
+        mad = np.nanmedian(dev, axis=2)
+        mean_ad = np.nanmean(dev, axis=2)
+
+    enough = (~np.isnan(windows)).sum(axis=2) >= MIN_HISTORY
+    with np.errstate(invalid="ignore", divide="ignore"):
+        diff = values[positions] - med
+        z = np.where(mad > 0, 0.6745 * diff / mad, diff / (1.2533 * mean_ad))
+    return np.where(enough & ((mad > 0) | (mean_ad > 0)), z, np.nan), med
+
+
+def evaluate(dates: pd.DatetimeIndex, stats: List[str], values: np.ndarray,
+             positions: np.ndarray, rules: List[Dict]) -> pd.DataFrame:
+    """Alerts for the rows at `positions` (one row per date × stat × check)."""
+    found = []
+    current = values[positions]
+
+    z, med = robust_z(values, positions)
+    rows, cols = np.nonzero(np.abs(np.nan_to_num(z)) >= Z_THRESHOLD)
+    found.append(pd.DataFrame({
+        "Date": dates[positions[rows]],
+        "Statistic": np.asarray(stats, dtype=object)[cols],
+        "Check": "Robust z-score",
+        "Value": current[rows, cols],
+        "Detail": [f"z = {zv:+.1f} vs {WINDOW}-day median {m:g}"
+                   for zv, m in zip(z[rows, cols], med[rows, cols])],
+    }))
+
+    higher_better = np.array([s not in LOWER_IS_BETTER for s in stats])
+    previous = np.vstack([np.full((1, len(stats)), np.nan), values])[positions]
+    dropped = (current == 0) & (previous != 0) & ~np.isnan(previous)
+    rows, cols = np.nonzero(dropped & (med > 0) & higher_better)
+    found.append(pd.DataFrame({
+        "Date": dates[positions[rows]],
+        "Statistic": np.asarray(stats, dtype=object)[cols],
+        "Check": "Dropped to zero",
+        "Value": 0.0,
+        "Detail": [f"{WINDOW}-day median {m:g}" for m in med[rows, cols]],
+    }))
+
+    col_of = {s: i for i, s in enumerate(stats)}
+    for rule in rules:
+        col = col_of.get(rule.get("stat"))
+        op = OPS.get(rule.get("op"))
+        if col is None or op is None:
+            continue
+        vals = current[:, col]
+        with np.errstate(invalid="ignore"):
+            hit = np.flatnonzero(op(vals, float(rule["value"])))
+        found.append(pd.DataFrame({
+            "Date": dates[positions[hit]],
+            "Statistic": rule["stat"],
+            "Check": "Rule",
+            "Value": vals[hit],
+            "Detail": f"{rule['op']} {rule['value']}",
+        }))
+
+    alerts = pd.concat(found, ignore_index=True)
+    alerts["Detected at"] = pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
+    return alerts[ALERT_COLUMNS]
+
+
+# =========================================================
+#                          JOB
+# =========================================================
+
+_LOCK = threading.Lock()
+
+
+def run_alerts(df: pd.DataFrame | None = None, backfill: bool = False) -> pd.DataFrame:
+    """
+    Evaluates the changed dates of `df` (default: the saved stats) and
+    rewrites their entries in the alerts log. Returns the new alerts.
+    """
+    with _LOCK:
+        dates, stats, values = _numeric_block(load_data() if df is None else df)
+
+        # Rounded so formula float noise (recomputed vs CSV round-trip) isn't a change
+        rounded = pd.DataFrame(values).round(6)
+        hashes = pd.util.hash_pandas_object(rounded, index=False).astype(str)
+        keys = dates.strftime("%Y-%m-%d")
+        state = {} if backfill else load_state()
+        changed = np.flatnonzero([state.get(k) != h for k, h in zip(keys, hashes)])
+
+        # A changed day also moves the baseline of the WINDOW days after it
+        marks = np.zeros(len(dates) + 1, dtype=int)
+        np.add.at(marks, changed, 1)
+        np.add.at(marks, np.minimum(changed + WINDOW + 1, len(dates)), -1)
+        positions = np.flatnonzero(np.cumsum(marks[:-1]) > 0)
+
+        alerts = evaluate(dates, stats, values, positions, load_rules())
+
+        log = load_alerts()
+        log = log[~log["Date"].isin(dates[positions])]
+        log = pd.concat([log, alerts], ignore_index=True) if not log.empty else alerts
+        # Written aside and swapped in, so the dashboard never reads a half-written log
+        tmp = ALERTS_FILE.with_name(f".{ALERTS_FILE.name}.{os.getpid()}.tmp")
+        log.sort_values(["Date", "Statistic"]).to_csv(tmp, index=False, date_format="%Y-%m-%d")
+        os.replace(tmp, ALERTS_FILE)
+        save_state(dict(zip(keys, hashes)))
+
+    return alerts
+
+
+def run_alerts_in_background(df: pd.DataFrame) -> threading.Thread:
+    """Starts run_alerts(df) on a daemon thread (used after dashboard saves)."""
+    thread = threading.Thread(target=run_alerts, args=(df,), daemon=True)
+    thread.start()
+    return thread
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Evaluate anomaly alerts on the stats table")
+    parser.add_argument("--backfill", action="store_true", help="re-evaluate every date")
+    args = parser.parse_args()
+
+    alerts = run_alerts(backfill=args.backfill)
+    print(f"{len(alerts)} alerts on the evaluated dates.")
+    if not alerts.empty:
+        print(alerts.tail(20).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+# api.py
+"""
+Read-only JSON API over the stats, for tools and scheduled reports that
+shouldn't pay for a Streamlit session.
+
+    uvicorn api:app --port 8600          # or: python api.py --port 8600
+
+    GET /stats                 daily stats     ?start=&end=&columns=a,b&owner=
+    GET /stats/weekly          weekly rollup   (same parameters)
+    GET /rollups/{metric}      overlay series  ?overlay=7-day moving average&start=&end=
+    GET /views                 saved Graphs views
+    GET /conditions            weekly conditions ?week=YYYY-MM-DD
+    GET /conditions/suggested  suggested conditions ?week=YYYY-MM-DD
+    GET /versions              saved versions of the stats (for ?as_of=)
+
+/stats, /stats/weekly, /rollups and /conditions/suggested also take
+?as_of=YYYY-MM-DDTHH:MM:SS to answer from the stats as they were then.
+
+Data goes through the same load_data / formula / rollup code as the
+dashboard and comes from the shared state store (rpl_stats/backend.py); it
+is reloaded in the background as soon as any process writes new stats, and
+views / conditions are tagged with their store revisions. Endpoints are plain
+functions, so Starlette runs them in its thread pool. Every response
+carries an ETag built from the data version, so If-None-Match requests get
+a 304 without any serialisation, and bodies are gzip-compressed.
+
+Set RPL_API_TOKEN to require "Authorization: Bearer <token>".
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from rpl_stats.backend import STATS, revision, watch
+from rpl_stats.conditions import condition_labels, load_conditions, suggest_conditions
+from rpl_stats.rollups import OVERLAYS, filter_by_date, overlay_frame, window_metrics
+from rpl_stats.snapshots import VERSIONS_FILE, list_versions, stats_as_of
+from rpl_stats.stats_store import (
+    STATS_BY_OWNER, compute_data_version, data_revision, load_data, load_saved_views,
+)
+
+API_TOKEN = os.environ.get("RPL_API_TOKEN")
+MAX_CACHED_BODIES = 128
+
+
+# =========================================================
+#                 SHARED DATA (RELOAD ON CHANGE)
+# =========================================================
+
+_LOCK = threading.Lock()
+_DATA: Dict = {"rev": None, "df": None, "version": None}
+
+
+def current_data() -> Tuple[pd.DataFrame, str]:
+    """(stats frame, data version), reloaded only when the stored stats change."""
+    rev = data_revision()
+    with _LOCK:
+        if _DATA["rev"] != rev:
+            df = load_data()
+            _DATA.update(rev=rev, df=df, version=compute_data_version(df))
+        return _DATA["df"], _DATA["version"]
+
+
+def _on_store_change(name: str, rev: int) -> None:
+    # Another process wrote: reload now instead of on the next request
+    if name == STATS:
+        current_data()
+
+
+watch(_on_store_change)
+
+
+def request_data(request: Request) -> Tuple[pd.DataFrame, str]:
+    """current_data(), or the snapshot picked by ?as_of=."""
+    as_of = request.query_params.get("as_of")
+    if not as_of:
+        return current_data()
+    snapshot = stats_as_of(query_timestamp(request, "as_of"))
+    if snapshot is None:
+        raise BadRequest(f"No stats version saved by {as_of}")
+    return snapshot
+
+
+def document_version(name: str) -> str:
+    """Version of a shared document (views / conditions)."""
+    return f"{name}-{revision(name)}"
+
+
+def file_version(path) -> str:
+    """Version of a JSON store file (mtime + size)."""
+    if not path.exists():
+        return "missing"
+    stat = path.stat()
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+# =========================================================
+#                  ETAG + SERIALISED BODY CACHE
+# =========================================================
+
+_BODIES: "OrderedDict[str, bytes]" = OrderedDict()
+
+
+def cached_json(request: Request, version: str, build: Callable[[], object]) -> Response:
+    """
+    JSON response for `build()`, tagged with (version, URL). A matching
+    If-None-Match gets a 304 and a repeat of the same URL reuses the
+    serialised body; `build` only runs on a miss.
+    """
+    key = f"{version}|{request.url.path}?{request.url.query}"
+    etag = '"' + hashlib.sha1(key.encode()).hexdigest()[:20] + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    with _LOCK:
+        body = _BODIES.get(etag)
+    if body is None:
+        body = json.dumps(build(), separators=(",", ":"), default=str).encode()
+        with _LOCK:
+            _BODIES[etag] = body
+            while len(_BODIES) > MAX_CACHED_BODIES:
+                _BODIES.popitem(last=False)
+
+    return Response(body, media_type="application/json", headers=headers)
+
+
+class BadRequest(Exception):
+    pass
+
+
+def query_timestamp(request: Request, name: str) -> pd.Timestamp | None:
+    """?name= parsed as a timestamp (None when absent); BadRequest when invalid."""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        return pd.Timestamp(value)
+    except ValueError:
+        raise BadRequest(f"Bad {name} timestamp {value!r}")
+
+
+def records(df: pd.DataFrame) -> List[Dict]:
+    """Row dicts with YYYY-MM-DD dates and NaN → null."""
+    out = df[["Date"] + [c for c in df.columns if c != "Date"]].copy()
+    out["Date"] = pd.to_datetime(out["Date"]).dt.strftime("%Y-%m-%d")
+    out = out.astype(object).where(out.notna(), None)
+    return out.to_dict(orient="records")
+
+
+def _stat_columns(request: Request, df: pd.DataFrame) -> List[str]:
+    """Stat columns picked by ?columns= and/or ?owner= (default: all)."""
+    cols = [c for c in df.columns if c != "Date"]
+    owner = request.query_params.get("owner")
+    if owner:
+        if owner not in STATS_BY_OWNER:
+            raise BadRequest(f"Unknown owner {owner!r}; use one of {list(STATS_BY_OWNER)}")
+        cols = [c for c in STATS_BY_OWNER[owner] if c in df.columns]
+    wanted = request.query_params.get("columns")
+    if wanted:
+        names = [c.strip() for c in wanted.split(",") if c.strip()]
+        unknown = [c for c in names if c not in df.columns]
+        if unknown:
+            raise BadRequest(f"Unknown columns: {unknown}")
+        cols = [c for c in names if c in cols]
+    return cols
+
+
+def _date_range(request: Request):
+    """("All time", None) or ("Custom", (start, end)) for filter_by_date."""
+    start = query_timestamp(request, "start")
+    end = query_timestamp(request, "end")
+    if start is None and end is None:
+        return "All time", None
+    return "Custom", (start or "1900-01-01", end or "2999-12-31")
+
+
+# =========================================================
+#                          ENDPOINTS
+# =========================================================
+
+def _stats_endpoint(granularity: str):
+    def endpoint(request: Request) -> Response:
+        df, version = request_data(request)
+        cols = _stat_columns(request, df)
+        label, custom = _date_range(request)
+        return cached_json(request, version, lambda: records(
+            window_metrics(df, cols, label, custom, granularity)
+        ))
+    return endpoint
+
+
+def rollup(request: Request) -> Response:
+    df, version = request_data(request)
+    metric = request.path_params["metric"]
+    overlay = request.query_params.get("overlay", "7-day moving average")
+    if metric not in df.columns or metric == "Date":
+        raise BadRequest(f"Unknown metric {metric!r}")
+    if overlay not in OVERLAYS:
+        raise BadRequest(f"Unknown overlay {overlay!r}; use one of {list(OVERLAYS)}")
+    label, custom = _date_range(request)
+
+    def build():
+        frame = overlay_frame(df, metric, overlay, version)
+        frame = filter_by_date(frame, label, custom)
+        return {"metric": metric, "overlay": overlay, "rows": records(frame)}
+
+    return cached_json(request, version, build)
+
+
+def views(request: Request) -> Response:
+    return cached_json(request, document_version("views"), load_saved_views)
+
+
+def conditions(request: Request) -> Response:
+    week = request.query_params.get("week")
+
+    def build():
+        data = load_conditions()
+        if week:
+            data = {stat: {week: weeks[week]} for stat, weeks in data.items() if week in weeks}
+        return data
+
+    return cached_json(request, document_version("conditions"), build)
+
+
+def suggested_conditions(request: Request) -> Response:
+    df, version = request_data(request)
+    week = request.query_params.get("week")
+    week_ts = query_timestamp(request, "week")
+
+    def build():
+        codes = suggest_conditions(df, version)
+        if week_ts is not None:
+            if week_ts not in codes.index:
+                return {}
+            return {week: condition_labels(codes.loc[week_ts]).to_dict()}
+        return {
+            ts.strftime("%Y-%m-%d"): condition_labels(row).to_dict()
+            for ts, row in codes.iterrows()
+        }
+
+    return cached_json(request, version, build)
+
+
+def versions(request: Request) -> Response:
+    def build():
+        saved = list_versions()
+        saved["saved_at"] = saved["saved_at"].dt.strftime("%Y-%m-%dT%H:%M:%S")
+        return saved.to_dict(orient="records")
+
+    return cached_json(request, file_version(VERSIONS_FILE), build)
+
+
+def health(request: Request) -> Response:
+    _, version = current_data()
+    return JSONResponse({"status": "ok", "data_version": version})
+
+
+# =========================================================
+#                     AUTH / ERRORS / APP
+# =========================================================
+
+class TokenAuthMiddleware:
+    """Bearer-token check (only installed when RPL_API_TOKEN is set)."""
+
+    def __init__(self, app, token: str):
+        self.app = app
+        self.expected = f"Bearer {token}".encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            auth = dict(scope["headers"]).get(b"authorization", b"")
+            if auth != self.expected:
+                await JSONResponse({"error": "unauthorized"}, status_code=401)(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+async def bad_request(request: Request, exc: BadRequest) -> Response:
+    return JSONResponse({"error": str(exc)}, status_code=400)
+
+
+middleware = [Middleware(GZipMiddleware, minimum_size=1000)]
+if API_TOKEN:
+    middleware.append(Middleware(TokenAuthMiddleware, token=API_TOKEN))
+
+app = Starlette(
+    routes=[
+        Route("/health", health),
+        Route("/stats", _stats_endpoint("Daily")),
+        Route("/stats/weekly", _stats_endpoint("Weekly")),
+        Route("/rollups/{metric:path}", rollup),
+        Route("/views", views),
+        Route("/conditions", conditions),
+        Route("/conditions/suggested", suggested_conditions),
+        Route("/versions", versions),
+    ],
+    middleware=middleware,
+    exception_handlers={BadRequest: bad_request},
+)
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Read-only RPL stats API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,51 @@
 import base64
-import json
+import copy
+import os
 import pathlib
-from datetime import datetime, timedelta, date
-from typing import Dict, List
+from concurrent.futures import as_completed
+from datetime import datetime
+from typing import Callable, Dict, List
 import hashlib
 
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
 
 # 👉 Supabase helper (reads the live leads table)
-from supabase_client import get_leads_df
+from supabase_client import get_lead_filter_options
+
+# 👉 Live leads change feed (one poller per server process, fanned out to sessions)
+from leads_feed import SessionLeads, extend_filter_options, leads_feed
+
+# 👉 Core library (no Streamlit): stats store, formulas, rollups, conditions, figures
+from rpl_stats.backend import backend
+from rpl_stats.edits import apply_cell_edits, editor_cells, row_hashes
+from rpl_stats.stats_store import (
+    MASTER_STATS, STATS_BY_OWNER,
+    data_digest, data_revision, data_version_key, load_colors, load_data,
+    load_saved_views, save_colors, save_data, save_saved_views, update_data_digest,
+)
+from rpl_stats.rollups import (
+    COMPARE_NONE, COMPARE_OPTIONS, OVERLAY_OPTIONS, OVERLAY_RAW, comparison_summary, window_metrics,
+)
+from rpl_stats.compact_stats import CompactStats, enable_copy_on_write, memory_report
+from rpl_stats.conditions import (
+    CONDITION_LEVELS, NO_CONDITION, bp_history, build_bp_aggregates,
+    build_conditions_matrix, condition_labels, load_conditions, set_battle_plan_check,
+    suggest_conditions, update_bp_check,
+)
+from rpl_stats.figures import Window, figure_futures, prewarm_views, resolve_view_graphs
+from rpl_stats.snapshots import stats_version, version_labels
+
+# 👉 Bulk import (CSV / Excel / Parquet → upsert by Date)
+from import_stats import IMPORT_TYPES, import_file
+
+# 👉 Cached, chunk-written CSV / Parquet / XLSX exports
+from export_stats import EXPORT_FORMATS, export_file, export_name
+
+# 👉 Anomaly alerts (re-evaluated in the background after every save)
+from alerts import load_alerts, run_alerts_in_background
 
 
 # =========================================================
@@ -125,95 +160,42 @@ st.markdown(
 # =========================================================
 
 BASE_DIR = pathlib.Path(__file__).parent
-DATA_FILE = BASE_DIR / "stats_data.csv"
-COLOR_FILE = BASE_DIR / "stats_colors.json"
 LOGO_FILE = BASE_DIR / "red_panda_logo.png"
-VIEWS_FILE = BASE_DIR / "saved_views.json"
-CONDITIONS_FILE = BASE_DIR / "weekly_conditions.json"
 
-DEFAULT_PALETTE = [
-    "#FF4B4B", "#FF9F1C", "#FFEA00", "#4ECDC4", "#1E90FF",
-    "#2ECC71", "#9B59B6", "#E67E22", "#F1C40F", "#16A085"
-]
+# RPL_COMPACT_STATS=float32 (or 1) / float64 → keep stats as one float block
+COMPACT_DTYPE = {
+    "1": "float32", "true": "float32",
+    "float32": "float32", "float64": "float64",
+}.get(os.environ.get("RPL_COMPACT_STATS", "").strip().lower())
+
+# float32 holds ~7 significant digits; don't write its binary noise out
+SAVE_FLOAT_FORMAT = "%.7g" if COMPACT_DTYPE == "float32" else None
+
+# Compact frames are views of a shared read-only block; writers must copy
+if COMPACT_DTYPE:
+    enable_copy_on_write()
 
 PRESET_NAMES = [
     "Staff meeting", "James stats", "Nick stats",
     "Alex stats", "Shiloh's stats", "Jake's stats",
 ]
 
-CONDITION_LEVELS = ["Non-Existence", "Danger", "Emergency", "Normal", "Affluence", "Power"]
-
 STAFF_MEMBERS = ["James", "Nick", "Alex", "Shiloh", "Jake"]
 
+# Session-state key prefix of the battle-plan step checkboxes
+BP_CHECK_KEY = "bp_check_"
 
-# =========================================================
-#                MASTER LIST OF ALL RPL STAT COLUMNS
-# =========================================================
+# Heatmap colours for CONDITION_LEVELS (same order)
+CONDITION_COLORS = ["#555560", "#C0392B", "#E67E22", "#4ECDC4", "#2ECC71", "#9B59B6"]
 
-MASTER_STATS = [
-    # Jake
-    "New Div 4 Content", "New Div 6 Content",
-    "Div 4 - CTR", "Div 6 - CTR",
-
-    # Shiloh
-    "Weighted Digital Assets", "Innovation Counts",
-    "Automation Breaks", "Software Development Expansion Index",
-
-    # Alex
-    "Google – Simple Close – Adspend",
-    "FB – Simple Close – Adspend",
-    "FB – True Blue Homes – Adspend",
-    "Leadzolo Supplement", "Property Leads Supplement",
-    "Total Adspend",
-    "Fallback (Listed)", "Fallback (Unsold)", "Fallback (Rejected)",
-    "Total Leads", "Sellable Leads",
-    "Leads Delivered (Provisional)",
-    "Leads Delivered (Refunded)",
-    "Leads Delivered (Corrected)",
-    "VLD (Provisional)", "VLD (Refunded)", "VLD (Corrected)",
-
-    # Nick
-    "New Identities To CRM", "Total # of Identities",
-    "Outflow", "# Leads Bought", "New Clients",
-    "Active Clients", "Finished Packages", "Resigns",
-    "Churn %", "Gross Income",
-
-    # James
-    "CAC", "Total Profit", "Profit Margin %",
-]
+# Graphs drawn straight away when "Render on scroll" is on
+EAGER_GRAPHS = 2
 
-STATS_BY_OWNER = {
-    "Jake": [
-        "New Div 4 Content", "New Div 6 Content",
-        "Div 4 - CTR", "Div 6 - CTR",
-    ],
-    "Shiloh": [
-        "Weighted Digital Assets", "Innovation Counts",
-        "Automation Breaks", "Software Development Expansion Index",
-    ],
-    "Alex": [
-        "Google – Simple Close – Adspend",
-        "FB – Simple Close – Adspend",
-        "FB – True Blue Homes – Adspend",
-        "Leadzolo Supplement", "Property Leads Supplement",
-        "Total Adspend",
-        "Fallback (Listed)", "Fallback (Unsold)", "Fallback (Rejected)",
-        "Total Leads", "Sellable Leads",
-        "Leads Delivered (Provisional)", "Leads Delivered (Refunded)",
-        "Leads Delivered (Corrected)",
-        "VLD (Provisional)", "VLD (Refunded)", "VLD (Corrected)",
-    ],
-    "Nick": [
-        "New Identities To CRM", "Total # of Identities",
-        "Outflow", "# Leads Bought", "New Clients",
-        "Active Clients", "Finished Packages", "Resigns",
-        "Churn %", "Gross Income",
-    ],
-    "James": [
-        "CAC", "Total Profit", "Profit Margin %",
-        "VLD (Corrected)",
-    ],
-}
+# Newest leads pulled for the Live Leads table (counts cover every match)
+LEADS_TABLE_LIMIT = 500
+
+# How often an open Live Leads panel picks up new rows from the feed
+LEADS_REFRESH_SECONDS = 5
 
 
 # =========================================================
@@ -233,229 +215,140 @@ def get_logo_base64() -> str | None:
 LOGO_B64 = get_logo_base64()
 
 
-# =========================================================
-#                FORMULA CALCULATIONS (NEW)
-# =========================================================
-
-def apply_formulas(df: pd.DataFrame) -> pd.DataFrame:
-    """Applies all derived-column formulas safely."""
-
-    def g(col):
-        return pd.to_numeric(df.get(col, 0), errors="coerce").fillna(0)
-
-    # Software Development Expansion Index
-    df["Software Development Expansion Index"] = (
-        g("Weighted Digital Assets")
-        + g("Innovation Counts")
-        - g("Automation Breaks")
-    )
-
-    # TOTAL AD SPEND
-    df["Total Adspend"] = (
-        g("Google – Simple Close – Adspend")
-        + g("FB – Simple Close – Adspend")
-        + g("FB – True Blue Homes – Adspend")
-        + g("Leadzolo Supplement")
-        + g("Property Leads Supplement")
-    )
-
-    # TOTAL LEADS
-    df["Total Leads"] = (
-        g("Fallback (Listed)")
-        + g("Fallback (Unsold)")
-        + g("Fallback (Rejected)")
-        + g("Leads Delivered (Provisional)")
-    )
-
-    # SELLABLE LEADS
-    df["Sellable Leads"] = (
-        g("Fallback (Unsold)")
-        + g("Fallback (Rejected)")
-        + g("Leads Delivered (Provisional)")
-    )
-
-    # LEADS DELIVERED CORRECTED
-    df["Leads Delivered (Corrected)"] = (
-        g("Leads Delivered (Provisional)")
-        - g("Leads Delivered (Refunded)")
-    )
-
-    # VLD CORRECTED
-    df["VLD (Corrected)"] = (
-        g("VLD (Provisional)") - g("VLD (Refunded)")
-    )
-
-    # TOTAL # OF IDENTITIES — cumulative
-    df = df.sort_values("Date")
-    if "New Identities To CRM" in df.columns:
-        df["Total # of Identities"] = g("New Identities To CRM").cumsum()
-    else:
-        df["Total # of Identities"] = None
-
-    # CHURN %
-    finished = g("Finished Packages")
-    resigns = g("Resigns")
-    df["Churn %"] = None
-    valid = finished > 0
-    df.loc[valid, "Churn %"] = ((finished - resigns) / finished) * 100
-
-    # TOTAL PROFIT
-    df["Total Profit"] = (
-        g("VLD (Corrected)") - g("Total Adspend")
-    )
-
-    # PROFIT MARGIN %
-    df["Profit Margin %"] = None
-    vld = g("VLD (Corrected)")
-    profit = df["Total Profit"]
-    mask = vld != 0
-    df.loc[mask, "Profit Margin %"] = (profit[mask] / vld[mask]) * 100
-
-    return df
 # =========================================================
 #                DATA LOAD / SAVE FUNCTIONS
 # =========================================================
 
-def ensure_daily_rows(df: pd.DataFrame) -> pd.DataFrame:
-    """Ensures all dates from min → today exist in the dataframe."""
-    if "Date" not in df.columns:
-        return df
-
-    if df.empty:
-        today = datetime.today().date()
-        return pd.DataFrame({"Date": [pd.to_datetime(today)]})
+def get_stats_df(columns: List[str] | None = None) -> pd.DataFrame:
+    """
+    Current session stats (Date + `columns` when given).
+    Shares memory with the session copy, so treat it as read-only.
+    """
+    if COMPACT_DTYPE:
+        return st.session_state.stats.frame(columns)
 
-    df = df.sort_values("Date")
-    min_date = df["Date"].min().date()
-    max_date = df["Date"].max().date()
-    today = datetime.today().date()
-    end = max(max_date, today)
+    df = st.session_state.df
+    if columns is None:
+        return df
+    return df[["Date"] + [c for c in columns if c in df.columns and c != "Date"]]
 
-    full_range = pd.date_range(start=min_date, end=end, freq="D")
-    base = pd.DataFrame({"Date": full_range})
 
-    return base.merge(df, on="Date", how="left")
+def get_stats_columns() -> List[str]:
+    """Stat column names of the session data (no data is touched)."""
+    if COMPACT_DTYPE:
+        return list(st.session_state.stats.columns)
+    return [c for c in st.session_state.df.columns if c != "Date"]
 
 
-def load_data() -> pd.DataFrame:
-    """Loads local CSV → ensures structure → applies formulas."""
-    if DATA_FILE.exists():
-        df = pd.read_csv(DATA_FILE)
+def set_stats_df(df: pd.DataFrame, hashes: np.ndarray | None = None,
+                 rows: List[int] | None = None) -> None:
+    """
+    Replaces the session stats and bumps the data version. `hashes` are the
+    per-row content hashes when the caller already kept them up to date;
+    `rows` the only positions that changed, so only they are rehashed.
+    """
+    old = get_stats_df() if rows is not None and "data_digest" in st.session_state else None
+    if COMPACT_DTYPE:
+        st.session_state.stats = CompactStats.from_frame(df, MASTER_STATS, COMPACT_DTYPE)
     else:
-        df = pd.DataFrame({"Date": pd.to_datetime([], utc=False)})
-
-    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
-    df = ensure_daily_rows(df)
-
-    # Ensure every master stat exists
-    for col in MASTER_STATS:
-        if col not in df.columns:
-            df[col] = None
-
-    # 🔥 APPLY FORMULAS
-    df = apply_formulas(df)
-
-    return df
-
-
-def save_data(df: pd.DataFrame) -> None:
-    """Save updated stats to CSV (dates properly formatted)."""
-    out = df.copy()
-    out["Date"] = out["Date"].dt.strftime("%Y-%m-%d")
-    out.to_csv(DATA_FILE, index=False)
-
-
-def load_colors(columns: List[str]) -> Dict[str, str]:
-    """Loads chart color assignments."""
-    if COLOR_FILE.exists():
-        try:
-            c = json.loads(COLOR_FILE.read_text())
-        except Exception:
-            c = {}
+        st.session_state.df = df
+    current = get_stats_df()
+    st.session_state.row_hashes = row_hashes(current) if hashes is None else hashes
+
+    if (old is not None and len(old) == len(current)
+            and old.dtypes.to_dict() == current.dtypes.to_dict()
+            and list(old.columns) == list(current.columns)):
+        digest = update_data_digest(st.session_state.data_digest, old, current, rows)
     else:
-        c = {}
+        digest = data_digest(current)
+    st.session_state.data_digest = digest
+    st.session_state.data_version = data_version_key(digest, current.columns)
 
-    idx = 0
-    for col in columns:
-        if col == "Date":
-            continue
-        if col not in c:
-            c[col] = DEFAULT_PALETTE[idx % len(DEFAULT_PALETTE)]
-            idx += 1
-    return c
 
+def commit_stats(df: pd.DataFrame, hashes: np.ndarray | None = None,
+                 rows: List[int] | None = None) -> None:
+    """
+    Makes `df` the session stats and persists the cells it changed relative
+    to the previous session stats (+ colors). `rows` are the only positions
+    that changed (from apply_cell_edits); without them the whole frame is
+    compared.
+    """
+    base = get_stats_df()
+    set_stats_df(df, hashes, rows)
+    st.session_state.colors = load_colors(df.columns)
+
+    rev = save_data(df, float_format=SAVE_FLOAT_FORMAT, base=base, rows=rows)
+    if rev is not None and rev == st.session_state.data_rev + 1:
+        # Nobody else wrote since we loaded, so the session frame is the stored
+        # table; otherwise the next rerun reloads it with their cells merged in
+        st.session_state.data_rev = rev
+    st.session_state.colors, st.session_state.doc_revs["colors"] = save_colors(st.session_state.colors)
+    run_alerts_in_background(df)
+    prewarm_views(
+        st.session_state.saved_views, PRESET_NAMES, get_stats_df(),
+        st.session_state.colors, st.session_state.data_version,
+    )
 
-def save_colors(colors: Dict[str, str]) -> None:
-    COLOR_FILE.write_text(json.dumps(colors, indent=2))
+
+def flush_editor_edits() -> None:
+    """
+    Saves table edits made against the session stats before they are
+    replaced by a reload: the editor's delta is positional and is reset
+    together with the data it was made on.
+    """
+    delta = st.session_state.get("rpl_editor")
+    if not delta or "row_hashes" not in st.session_state:
+        return
+    df = get_stats_df()
+    cells = editor_cells(delta, list(df.columns[1:]))
+    updated_df, written, rows = apply_cell_edits(df, st.session_state.row_hashes, cells)
+    if updated_df is not None:
+        save_data(updated_df, float_format=SAVE_FLOAT_FORMAT, base=df, rows=rows)
+        st.toast(f"Stats saved ({written} cell{'s' if written != 1 else ''})", icon="✅")
 
 
 # =========================================================
-#        DATE FILTERING / RESAMPLING / WEEK HELPERS
+#                   CONDITIONS STORE
 # =========================================================
 
-def filter_by_date(df: pd.DataFrame, range_label: str, custom_range):
-    """Filters by preset or custom date range."""
-    if df.empty or "Date" not in df.columns:
-        return df
-
-    df = df.sort_values("Date")
-    end = df["Date"].max()
-
-    if range_label == "All time":
-        return df
-
-    if range_label == "Last 7 days":
-        start = end - timedelta(days=7)
-    elif range_label == "Last 30 days":
-        start = end - timedelta(days=30)
-    elif range_label == "Last 90 days":
-        start = end - timedelta(days=90)
-    elif range_label == "Custom" and custom_range:
-        start, end = custom_range
-        start = pd.to_datetime(start)
-        end = pd.to_datetime(end)
-    else:
-        return df
-
-    return df[(df["Date"] >= start) & (df["Date"] <= end)]
-
-
-def resample_df(df: pd.DataFrame, granularity: str):
-    """Resamples dataframe into daily or weekly data."""
-    if granularity == "Daily":
-        return df
-
-    if granularity == "Weekly":
-        df = df.set_index("Date")
-        weekly = df.resample("W-THU").mean(numeric_only=True)
-        weekly["Date"] = weekly.index
-        return weekly.reset_index(drop=True)
-
-    return df
-
-
-def week_date_to_str(d: date) -> str:
-    return d.strftime("%Y-%m-%d")
-
-
-def week_str_to_date(s: str) -> date:
-    return datetime.strptime(s, "%Y-%m-%d").date()
-
-
-def get_latest_completed_week_end() -> date:
-    """Returns most recent Thursday (week end)."""
-    today = datetime.today().date()
-    weekday = today.weekday()
-    days_back = (weekday - 3) % 7  # Thursday = 3
-    return today - timedelta(days=days_back)
-
-
-def save_saved_views():
-    VIEWS_FILE.write_text(json.dumps(st.session_state.saved_views, indent=2))
-
-
-def save_weekly_conditions():
-    CONDITIONS_FILE.write_text(json.dumps(st.session_state.weekly_conditions, indent=2))
+def set_weekly_conditions(conditions: Dict, rev: int) -> None:
+    """Replaces the session conditions and rebuilds their matrix / aggregates."""
+    st.session_state.weekly_conditions = conditions
+    st.session_state.conditions_matrix = build_conditions_matrix(conditions)
+    st.session_state.bp_aggregates = build_bp_aggregates(conditions)
+    st.session_state.doc_revs["conditions"] = rev
+    # Checkbox widgets keep their own values; drop them so they show the reloaded checks
+    for key in [k for k in st.session_state if k.startswith(BP_CHECK_KEY)]:
+        del st.session_state[key]
+
+
+def toggle_bp_check(key: str, week: str, person: str, stat_name: str, step: int) -> None:
+    """on_change of a battle-plan checkbox: stores just the toggled step."""
+    checked = st.session_state[key]
+    expected = st.session_state.doc_revs.get("conditions", 0) + 1
+    stored, rev = set_battle_plan_check(stat_name, week, step, checked)
+    if rev != expected:
+        # Someone else changed the conditions meanwhile (or already set this step)
+        set_weekly_conditions(stored, rev)
+        return
+    st.session_state.weekly_conditions[stat_name][week]["checks"][step] = checked
+    update_bp_check(st.session_state.bp_aggregates, week, person, stat_name, checked)
+    st.session_state.doc_revs["conditions"] = rev
+
+
+def sync_shared_documents() -> None:
+    """Reloads views / colors / conditions another session or process changed."""
+    revs = backend().revisions()
+    seen = st.session_state.doc_revs
+    if "views" in seen and seen["views"] != revs.get("views", 0):
+        st.session_state.saved_views = load_saved_views()
+        st.session_state.views_base = copy.deepcopy(st.session_state.saved_views)
+        seen["views"] = revs.get("views", 0)
+    if "colors" in seen and seen["colors"] != revs.get("colors", 0):
+        st.session_state.colors = load_colors(get_stats_columns())
+        seen["colors"] = revs.get("colors", 0)
+    if "conditions" in seen and seen["conditions"] != revs.get("conditions", 0):
+        set_weekly_conditions(load_conditions(), revs.get("conditions", 0))
 
 
 # =========================================================
@@ -488,35 +381,36 @@ if "logged_in" not in st.session_state:
 if "current_user" not in st.session_state:
     st.session_state.current_user = None
 
-if "df" not in st.session_state:
-    st.session_state.df = load_data()
+# Revisions of the shared documents this session has loaded
+if "doc_revs" not in st.session_state:
+    st.session_state.doc_revs = {}
+
+# (Re)load when another session, process or job (e.g. lead ingestion) wrote stats
+if st.session_state.get("data_rev") != data_revision():
+    flush_editor_edits()
+    st.session_state.data_rev = data_revision()
+    set_stats_df(load_data())
+
+sync_shared_documents()
 
 if "colors" not in st.session_state:
-    st.session_state.colors = load_colors(st.session_state.df.columns)
+    st.session_state.doc_revs["colors"] = backend().revisions().get("colors", 0)
+    st.session_state.colors = load_colors(get_stats_df().columns)
 
 if "graphs" not in st.session_state:
     st.session_state.graphs = [{"id": 1, "metrics": [], "overrides": {}}]
 
 if "saved_views" not in st.session_state:
-    if VIEWS_FILE.exists():
-        try:
-            st.session_state.saved_views = json.loads(VIEWS_FILE.read_text())
-        except Exception:
-            st.session_state.saved_views = {}
-    else:
-        st.session_state.saved_views = {}
+    st.session_state.doc_revs["views"] = backend().revisions().get("views", 0)
+    st.session_state.saved_views = load_saved_views()
+    st.session_state.views_base = copy.deepcopy(st.session_state.saved_views)
 
 if "current_view" not in st.session_state:
     st.session_state.current_view = "None (custom)"
 
 if "weekly_conditions" not in st.session_state:
-    if CONDITIONS_FILE.exists():
-        try:
-            st.session_state.weekly_conditions = json.loads(CONDITIONS_FILE.read_text())
-        except Exception:
-            st.session_state.weekly_conditions = {}
-    else:
-        st.session_state.weekly_conditions = {}
+    rev = backend().revisions().get("conditions", 0)
+    set_weekly_conditions(load_conditions(), rev)
 
 
 # =========================================================
@@ -635,6 +529,12 @@ if not st.session_state.logged_in:
 
 top_right_logout()
 
+# Build the preset views' figures in the background (once per data version)
+prewarm_views(
+    st.session_state.saved_views, PRESET_NAMES, get_stats_df(),
+    st.session_state.colors, st.session_state.data_version,
+)
+
 
 # =========================================================
 #                      HEADER / TITLE
@@ -651,6 +551,105 @@ def centered_logo_and_title():
     )
 
 
+# =========================================================
+#                      EXPORT BUTTONS
+# =========================================================
+
+def export_buttons(make_df: Callable[[], pd.DataFrame], view_key: str, view_label: str) -> None:
+    """
+    One download button per format. `make_df` and the file are only run /
+    built when a button is clicked (off the script thread), then cached.
+    """
+    version = st.session_state.data_version
+    cols = st.columns(len(EXPORT_FORMATS))
+
+    for col, (fmt, (_, mime)) in zip(cols, EXPORT_FORMATS.items()):
+        with col:
+            st.download_button(
+                f"⬇ {fmt}",
+                data=lambda fmt=fmt: export_file(make_df(), view_key, version, fmt).read_bytes(),
+                file_name=export_name(view_label, fmt),
+                mime=mime,
+                key=f"export_{view_key}_{fmt}",
+                on_click="ignore",
+            )
+
+
+# =========================================================
+#                     LIVE LEADS PANEL
+# =========================================================
+
+@st.fragment(run_every=LEADS_REFRESH_SECONDS)
+def live_leads_panel():
+    """
+    Leads filters, counts chart and newest-leads table. Reruns on its own
+    every LEADS_REFRESH_SECONDS and only appends what the process-wide feed
+    picked up since, so an idle page stays live without querying Supabase.
+    """
+    feed = leads_feed()
+
+    # Filters are pushed down into the Supabase query / RPC
+    if "lead_options" not in st.session_state:
+        try:
+            st.session_state.lead_options = get_lead_filter_options()
+        except Exception:
+            pass
+    lead_options = st.session_state.get("lead_options", {"status": [], "source": []})
+
+    lf1, lf2, lf3, lf4 = st.columns([2, 2, 2, 1])
+    with lf1:
+        created_range = st.date_input("Created between", value=(), key="leads_created")
+    with lf2:
+        lead_statuses = st.multiselect("Status", lead_options["status"], key="leads_status")
+    with lf3:
+        lead_sources = st.multiselect("Source", lead_options["source"], key="leads_source")
+    with lf4:
+        lead_bucket = st.radio("Counts", ["Daily", "Weekly"], key="leads_bucket")
+
+    lead_filters = {
+        "start": created_range[0] if len(created_range) == 2 else None,
+        "end": created_range[1] if len(created_range) == 2 else None,
+        "statuses": lead_statuses,
+        "sources": lead_sources,
+    }
+    bucket = "week" if lead_bucket == "Weekly" else "day"
+
+    # New filters load once; after that only feed rows are appended
+    live = st.session_state.get("live_leads")
+    try:
+        if live is None or not live.matches(lead_filters, bucket):
+            live = SessionLeads(lead_filters, bucket, LEADS_TABLE_LIMIT, feed)
+        else:
+            new_rows = live.refresh(feed)
+            if not new_rows.empty and "lead_options" in st.session_state:
+                st.session_state.lead_options = extend_filter_options(lead_options, new_rows)
+        st.session_state.live_leads = live
+        leads_df, lead_counts = live.rows, live.counts
+    except Exception:
+        leads_df, lead_counts = pd.DataFrame(), pd.DataFrame()
+
+    if not lead_counts.empty:
+        fig = go.Figure(go.Bar(x=lead_counts["period"], y=lead_counts["leads"]))
+        fig.update_layout(
+            height=220,
+            margin=dict(l=40, r=40, t=10, b=30),
+            yaxis=dict(title="Leads"),
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+    if not leads_df.empty:
+        if "created" in leads_df.columns:
+            # A new frame: the cached rows keep their raw cursor values
+            leads_df = leads_df.assign(created=pd.to_datetime(
+                leads_df["created"], errors="coerce"
+            ))
+        st.dataframe(leads_df, use_container_width=True, height=260)
+        if len(leads_df) >= LEADS_TABLE_LIMIT:
+            st.caption(f"Showing the newest {LEADS_TABLE_LIMIT} matching leads.")
+    else:
+        st.info("No leads found yet.")
+
+
 # =========================================================
 #                      DATA TABLE PAGE
 # =========================================================
@@ -668,21 +667,9 @@ def page_data_table():
         unsafe_allow_html=True
     )
 
-    try:
-        leads_df = get_leads_df()
-    except Exception:
-        leads_df = pd.DataFrame()
-
     st.markdown("<div style='height:12px;'></div>", unsafe_allow_html=True)
 
-    if not leads_df.empty:
-        if "created" in leads_df.columns:
-            leads_df["created"] = pd.to_datetime(
-                leads_df["created"], errors="coerce"
-            )
-        st.dataframe(leads_df, use_container_width=True, height=260)
-    else:
-        st.info("No leads found yet.")
+    live_leads_panel()
 
     st.markdown("<div style='height:28px;'></div>", unsafe_allow_html=True)
 
@@ -691,6 +678,30 @@ def page_data_table():
         unsafe_allow_html=True,
     )
 
+    alerts = load_alerts()
+    if not alerts.empty:
+        cutoff = alerts["Date"].max() - pd.Timedelta(days=7)
+        recent = alerts[alerts["Date"] > cutoff]
+        with st.expander(f"🚨 Alerts ({len(recent)} in the latest 7 days, {len(alerts)} logged)"):
+            show_all = st.checkbox("Show full history", key="alerts_show_all")
+            st.dataframe(alerts if show_all else recent, use_container_width=True, height=240)
+
+    with st.expander("Bulk import (CSV / Excel / Parquet)"):
+        upload = st.file_uploader(
+            "Stats file with a Date column", type=IMPORT_TYPES, key="bulk_import_file"
+        )
+        if upload is not None and st.button("Import", key="bulk_import_btn"):
+            try:
+                merged, report, skipped = import_file(upload, upload.name, base=get_stats_df())
+            except Exception as e:
+                st.error(f"Import failed: {e}")
+            else:
+                commit_stats(merged)
+                st.dataframe(report, use_container_width=True)
+                if skipped:
+                    st.caption("Skipped (formula or duplicate) columns: " + ", ".join(map(str, skipped)))
+                st.toast("Import saved", icon="✅")
+
     owner_view = st.selectbox(
         "Stats owner view",
         ["All stats"] + STAFF_MEMBERS,
@@ -698,7 +709,7 @@ def page_data_table():
         help="Filter visible columns by stat owner."
     )
 
-    df = st.session_state.df.copy()
+    df = get_stats_df()
 
     if owner_view == "All stats":
         visible_cols = ["Date"] + MASTER_STATS
@@ -707,9 +718,19 @@ def page_data_table():
         owned = STATS_BY_OWNER.get(owner_view, [])
         visible_cols = ["Date"] + [c for c in owned if c in df.columns]
 
-    table_df = df[visible_cols].copy()
+    table_df = df[visible_cols]
+
+    with st.expander("Export"):
+        export_scope = st.radio(
+            "Export", ["Visible columns", "Full history (all columns)"],
+            horizontal=True, key="table_export_scope", label_visibility="collapsed",
+        )
+        if export_scope == "Visible columns":
+            export_buttons(lambda: table_df, f"table|{owner_view}", owner_view)
+        else:
+            export_buttons(lambda: df, "table|full", "full history")
 
-    edited = st.data_editor(
+    st.data_editor(
         table_df,
         key="rpl_editor",
         num_rows="dynamic",
@@ -722,23 +743,14 @@ def page_data_table():
         }
     )
 
-    if "Date" in edited.columns:
-        edited["Date"] = pd.to_datetime(edited["Date"], errors="coerce")
-
-    if not edited.equals(table_df):
-        updated_df = df.copy()
-        for col in visible_cols:
-            updated_df[col] = edited[col]
-
-        # 🔥 Reapply formulas and save
-        updated_df = apply_formulas(updated_df)
+    # Only the cells in the editor's delta are checked (row hashes) and written
+    hashes = st.session_state.row_hashes
+    cells = editor_cells(st.session_state.get("rpl_editor") or {}, visible_cols[1:])
+    updated_df, written, rows = apply_cell_edits(df, hashes, cells) if cells else (None, 0, [])
 
-        st.session_state.df = updated_df
-        st.session_state.colors = load_colors(updated_df.columns)
-        save_data(updated_df)
-        save_colors(st.session_state.colors)
-
-        st.toast("Stats saved", icon="✅")
+    if updated_df is not None:
+        commit_stats(updated_df, hashes, rows)
+        st.toast(f"Stats saved ({written} cell{'s' if written != 1 else ''})", icon="✅")
 # =========================================================
 #                        GRAPHS PAGE
 # =========================================================
@@ -750,10 +762,11 @@ def add_graph():
     st.session_state.graphs = graphs
 
 
-def page_graphs(granularity: str, date_range_label: str, custom_range):
+def page_graphs(granularity: str, date_range_label: str, custom_range, compare: str):
     centered_logo_and_title()
 
-    df = st.session_state.df.copy()
+    # Column names only — stat data is pulled once the graphed metrics are known
+    stat_cols = get_stats_columns()
 
     # Owner filter
     owner = st.selectbox(
@@ -762,32 +775,45 @@ def page_graphs(granularity: str, date_range_label: str, custom_range):
     )
 
     if owner != "All":
-        visible_cols = ["Date"] + [
-            c for c in STATS_BY_OWNER.get(owner, []) if c in df.columns
-        ]
-        df = df[visible_cols]
+        all_stat_cols = [c for c in STATS_BY_OWNER.get(owner, []) if c in stat_cols]
+    else:
+        all_stat_cols = stat_cols
 
-    if df.empty or "Date" not in df.columns:
-        st.warning("No data available.")
+    if not all_stat_cols:
+        st.info("No statistics to graph.")
         return
 
-    df = df.dropna(subset=["Date"])
-    df = df.sort_values("Date")
+    # Time travel: draw from any saved version instead of the live data
+    labels = version_labels()
+    as_of = st.selectbox(
+        "As of",
+        [None] + list(labels),
+        format_func=lambda seq: "Latest" if seq is None else labels[seq],
+        key="graphs_as_of",
+        help="Show the stats as they were saved at an earlier version.",
+    )
+    snapshot = stats_version(as_of) if as_of is not None else None
+    version = snapshot[1] if snapshot else st.session_state.data_version
 
-    # Apply date filter & granularity
-    df = filter_by_date(df, date_range_label, custom_range)
-    df = resample_df(df, granularity)
+    def source_df(columns: List[str] | None = None) -> pd.DataFrame:
+        if snapshot is None:
+            return get_stats_df(columns)
+        frame = snapshot[0]
+        return frame if columns is None else frame.reindex(columns=["Date"] + columns)
 
-    if df.empty:
+    if window_metrics(source_df([]), [], date_range_label, custom_range, granularity).empty:
         st.info("No data in this range.")
         return
 
-    # 🔥 ALWAYS use every stat in df
-    all_stat_cols = [c for c in df.columns if c != "Date"]
-
-    if not all_stat_cols:
-        st.info("No statistics to graph.")
-        return
+    with st.expander("Export this view"):
+        source = source_df()
+        export_buttons(
+            lambda: window_metrics(
+                source, all_stat_cols, date_range_label, custom_range, granularity
+            ),
+            f"graphs|{owner}|{date_range_label}|{custom_range}|{granularity}|{as_of}",
+            f"{owner} {granularity} {date_range_label}",
+        )
 
     # -----------------------------------------------------
     # Saved views
@@ -809,6 +835,7 @@ def page_graphs(granularity: str, date_range_label: str, custom_range):
 
     if current_view_choice != st.session_state.current_view:
         st.session_state.current_view = current_view_choice
+        st.session_state.loaded_graphs = set()
 
         if current_view_choice == "None (custom)":
             st.session_state.graphs = [{"id": 1, "metrics": [], "overrides": {}}]
@@ -816,12 +843,7 @@ def page_graphs(granularity: str, date_range_label: str, custom_range):
             view_conf = st.session_state.saved_views.get(
                 current_view_choice, {"graphs": []}
             )
-            graphs_conf = view_conf.get("graphs", [])
-
-            new_graphs = []
-            for idx, g in enumerate(graphs_conf, start=1):
-                metrics = [m for m in g.get("metrics", []) if m in all_stat_cols]
-                new_graphs.append({"id": idx, "metrics": metrics, "overrides": {}})
+            new_graphs = resolve_view_graphs(view_conf, all_stat_cols)
 
             if not new_graphs:
                 new_graphs = [{"id": 1, "metrics": [], "overrides": {}}]
@@ -834,16 +856,36 @@ def page_graphs(granularity: str, date_range_label: str, custom_range):
             if st.button("Save current graphs to this view"):
                 graphs = st.session_state.graphs
                 st.session_state.saved_views[current_view_choice] = {
-                    "graphs": [{"metrics": g["metrics"]} for g in graphs]
+                    "graphs": [
+                        {"metrics": g["metrics"], "overrides": g.get("overrides", {})}
+                        for g in graphs
+                    ]
                 }
-                save_saved_views()
+                views, st.session_state.doc_revs["views"] = save_saved_views(
+                    st.session_state.saved_views, st.session_state.views_base
+                )
+                st.session_state.saved_views = views
+                st.session_state.views_base = copy.deepcopy(views)
                 st.success(f"Saved current graphs to '{current_view_choice}'.")
+    with col_sv2:
+        lazy = st.toggle(
+            "Render on scroll",
+            key="lazy_graphs",
+            help=f"Only the first {EAGER_GRAPHS} graphs are drawn; load the rest as you reach them.",
+        )
+
+    # Period comparison table goes above the graphs, filled once metrics are known
+    summary_slot = st.container()
 
     graphs = st.session_state.graphs
+    loaded = st.session_state.setdefault("loaded_graphs", set())
+    deferred = set()
+    eager_left = EAGER_GRAPHS
 
     # -----------------------------------------------------
-    # Render all graph blocks
+    # Graph blocks: pick metrics first, chart into a slot below
     # -----------------------------------------------------
+    slots = []
     for idx, graph in enumerate(graphs):
         if idx > 0:
             st.markdown("---")
@@ -859,35 +901,65 @@ def page_graphs(granularity: str, date_range_label: str, custom_range):
 
         graph["metrics"] = selected
 
+        # Per-trace overlay (moving average, rolling sum, deltas)
+        overrides = graph.setdefault("overrides", {})
         if selected:
-            # Make sure every metric is numeric where possible
-            for metric in selected:
-                df[metric] = pd.to_numeric(df[metric], errors="coerce")
-
-            fig = go.Figure()
-
-            for metric in selected:
-                fig.add_trace(
-                    go.Scatter(
-                        x=df["Date"],
-                        y=df[metric],
-                        mode="lines",
-                        name=metric,
-                        line=dict(color=st.session_state.colors.get(metric)),
+            with st.expander("Trace options"):
+                for metric in selected:
+                    current = overrides.get(metric, OVERLAY_RAW)
+                    overrides[metric] = st.selectbox(
+                        metric,
+                        OVERLAY_OPTIONS,
+                        index=OVERLAY_OPTIONS.index(current)
+                        if current in OVERLAY_OPTIONS else 0,
+                        key=f"overlay_{graph['id']}_{metric}",
                     )
-                )
 
-            fig.update_layout(
-                height=600,
-                margin=dict(l=40, r=40, t=10, b=40),
-                dragmode="pan",
-                xaxis=dict(type="date", rangeslider=dict(visible=True)),
-                yaxis=dict(title="Value"),
-                legend=dict(orientation="v", xanchor="right", x=1.02, y=0.95),
-                modebar=dict(orientation="h"),
-            )
+        # Placeholder now, figure later (or a load button when deferred)
+        slot = st.empty()
+        if selected and lazy and eager_left <= 0 and graph["id"] not in loaded:
+            if slot.button(f"Load graph {idx + 1}", key=f"load_graph_{graph['id']}"):
+                loaded.add(graph["id"])
+                slot.caption("⏳ Building graph…")
+            else:
+                deferred.add(graph["id"])
+        elif selected:
+            eager_left -= 1
+            slot.caption("⏳ Building graph…")
+        slots.append(slot)
+
+    # One columnar read for the union of metrics; figures build on the
+    # shared thread pool, cheapest first (cached ones are ready at once)
+    shown = [m for graph in graphs for m in graph["metrics"]]
+
+    if compare != COMPARE_NONE and shown:
+        summary = comparison_summary(
+            source_df(shown), shown, date_range_label, custom_range, compare, version,
+        )
+        with summary_slot:
+            if summary.empty:
+                st.info("Pick a date range other than “All time” to compare periods.")
+            else:
+                st.markdown(f"#### This period vs {compare.lower()}")
+                st.dataframe(summary, use_container_width=True, hide_index=True)
+    wanted = [
+        {**graph, "metrics": []} if graph["id"] in deferred else graph
+        for graph in graphs
+    ]
+    futures = figure_futures(
+        wanted,
+        source_df(shown),
+        st.session_state.colors,
+        Window(date_range_label, custom_range, granularity, compare),
+        version,
+    )
 
-            st.plotly_chart(fig, use_container_width=True)
+    # -----------------------------------------------------
+    # Fill each placeholder as its figure becomes ready
+    # -----------------------------------------------------
+    slot_of = {future: slots[idx] for idx, future in futures.items()}
+    for future in as_completed(slot_of):
+        slot_of[future].plotly_chart(future.result(), use_container_width=True)
 
     # Add graph button
     st.markdown('<div id="add-graph-container">', unsafe_allow_html=True)
@@ -904,29 +976,34 @@ def page_conditions_table():
     centered_logo_and_title()
 
     conditions = st.session_state.weekly_conditions
-    if not conditions:
-        st.info("No conditions or battle plans exist yet.")
-        return
-
-    weeks = []
-    for metric_data in conditions.values():
-        for wk in metric_data.keys():
-            try:
-                weeks.append(week_str_to_date(wk))
-            except Exception:
-                pass
+    suggested = suggest_conditions(get_stats_df(), st.session_state.data_version)
 
-    if not weeks:
+    weeks = st.session_state.conditions_matrix.weeks.union(suggested.index)
+    if weeks.empty:
         st.info("No weekly condition entries found.")
         return
 
-    weeks = sorted(set(weeks))
-    week_labels = [week_date_to_str(w) for w in weeks]
+    week_labels = list(weeks.strftime("%Y-%m-%d"))
 
     selected_week_str = st.selectbox(
         "Week ending (Thursday)", week_labels, index=len(week_labels) - 1
     )
 
+    week_ts = pd.Timestamp(selected_week_str)
+    week_suggestions = (
+        condition_labels(suggested.loc[week_ts])
+        if week_ts in suggested.index else pd.Series(dtype=object)
+    )
+
+    with st.expander("Suggested conditions (from stat trends)"):
+        if week_suggestions.empty:
+            st.info("No stats recorded for this week.")
+        else:
+            st.dataframe(
+                week_suggestions.rename("Suggested").rename_axis("Statistic").reset_index(),
+                use_container_width=True,
+            )
+
     rows = []
     for stat_name, metric_data in conditions.items():
         entry = metric_data.get(selected_week_str)
@@ -934,6 +1011,7 @@ def page_conditions_table():
             rows.append({
                 "Statistic": stat_name,
                 "Condition": entry.get("condition", ""),
+                "Suggested": week_suggestions.get(stat_name, ""),
                 "Assigned to": entry.get("assigned_to", ""),
                 "Battle plan preview": "Click ▾ to view"
             })
@@ -974,21 +1052,11 @@ def page_conditions_battle_plans():
         st.info("No battle plans exist yet.")
         return
 
-    weeks = []
-    for metric_data in conditions.values():
-        for wk in metric_data.keys():
-            try:
-                weeks.append(week_str_to_date(wk))
-            except Exception:
-                pass
-
-    if not weeks:
+    week_labels = st.session_state.conditions_matrix.week_labels()
+    if not week_labels:
         st.info("No battle plan data found.")
         return
 
-    weeks = sorted(set(weeks))
-    week_labels = [week_date_to_str(w) for w in weeks]
-
     selected_week_str = st.selectbox(
         "Week ending (Thursday)", week_labels, index=len(week_labels) - 1
     )
@@ -1018,7 +1086,6 @@ def page_conditions_battle_plans():
 
     if not any(len(v) > 0 for v in per_person.values()):
         st.info("No battle plans recorded this week.")
-        return
 
     for person in STAFF_MEMBERS:
         tasks = per_person[person]
@@ -1028,51 +1095,135 @@ def page_conditions_battle_plans():
         st.markdown(f"### {person}")
 
         for stat_name, idx_step, step_text, checked in tasks:
-            key = f"bp_{selected_week_str}_{person}_{stat_name}_{idx_step}"
+            key = f"{BP_CHECK_KEY}{selected_week_str}_{person}_{stat_name}_{idx_step}"
 
-            new_val = st.checkbox(
+            st.checkbox(
                 f"{step_text} _(stat: {stat_name})_",
                 value=checked,
-                key=key
+                key=key,
+                on_change=toggle_bp_check,
+                args=(key, selected_week_str, person, stat_name, idx_step),
             )
 
-            if new_val != checked:
-                entry = conditions[stat_name][selected_week_str]
-                entry["checks"][idx_step] = new_val
-                conditions[stat_name][selected_week_str] = entry
-                st.session_state.weekly_conditions = conditions
-                save_weekly_conditions()
-
         st.markdown("---")
 
     # PERFORMANCE TABLE
     st.markdown("## Performance Summary")
 
-    perf_rows = []
-    for person in STAFF_MEMBERS:
-        tasks = per_person[person]
-        if not tasks:
-            continue
+    history = bp_history(st.session_state.bp_aggregates, "person")
+    week_perf = history[history["Week"] == selected_week_str].drop(columns="Week")
+
+    if not week_perf.empty:
+        st.dataframe(week_perf.reset_index(drop=True), use_container_width=True)
+    else:
+        st.info("No performance data for this week.")
+
+    # PERFORMANCE HISTORY (all weeks)
+    st.markdown("## Performance History")
+
+    by = st.radio("Break down by", ["Person", "Statistic"], horizontal=True, key="bp_history_by")
+    kind = {"Person": "person", "Statistic": "stat"}[by]
+    history = bp_history(st.session_state.bp_aggregates, kind)
+    if history.empty:
+        st.info("No battle plan history yet.")
+        return
+
+    fig = go.Figure()
+    for name, rows in history.groupby(by, sort=False):
+        fig.add_trace(go.Scatter(
+            x=rows["Week"], y=rows["Performance %"], mode="lines+markers", name=name,
+            customdata=rows[["Completed", "Total"]],
+            hovertemplate="%{x}: %{y}% (%{customdata[0]}/%{customdata[1]})",
+        ))
+    fig.update_layout(
+        height=380,
+        margin=dict(l=40, r=40, t=20, b=40),
+        yaxis=dict(title="Performance %", range=[0, 105]),
+        xaxis=dict(title="Week ending", type="category"),
+    )
+    st.plotly_chart(fig, use_container_width=True)
 
-        total = len(tasks)
-        completed = sum(
-            1
-            for stat_name, i, _, _ in tasks
-            if conditions[stat_name][selected_week_str]["checks"][i]
+    with st.expander("History table"):
+        st.dataframe(
+            history.pivot(index=by, columns="Week", values="Performance %"),
+            use_container_width=True,
         )
-        pct = round((completed / total) * 100, 1) if total > 0 else 0
 
-        perf_rows.append({
-            "Person": person,
-            "Completed": completed,
-            "Total": total,
-            "Performance %": pct,
-        })
 
-    if perf_rows:
-        st.dataframe(pd.DataFrame(perf_rows), use_container_width=True)
+# =========================================================
+#          CONDITIONS → HISTORY (STAT × WEEK MATRIX)
+# =========================================================
+
+def page_conditions_history():
+    centered_logo_and_title()
+
+    source = st.radio("Conditions", ["Recorded", "Suggested"], horizontal=True,
+                      key="cond_history_source")
+
+    if source == "Recorded":
+        matrix = st.session_state.conditions_matrix
+        weeks, stats, codes = matrix.weeks, matrix.stats, matrix.codes
     else:
-        st.info("No performance data for this week.")
+        suggested = suggest_conditions(get_stats_df(), st.session_state.data_version)
+        weeks, stats, codes = suggested.index, list(suggested.columns), suggested.to_numpy().T
+
+    if len(weeks) == 0 or not stats:
+        st.info("No weekly condition entries found.")
+        return
+
+    labels = list(weeks.strftime("%Y-%m-%d"))
+    if len(labels) > 1:
+        first, last = st.select_slider(
+            "Weeks", options=labels,
+            value=(labels[max(0, len(labels) - 26)], labels[-1]),
+            key=f"cond_history_range_{source}",
+        )
+    else:
+        first = last = labels[0]
+    lo, hi = labels.index(first), labels.index(last) + 1
+
+    # One vectorised pass: codes → heat values (NaN = none) and hover names
+    block = codes[:, lo:hi]
+    z = np.where(block == NO_CONDITION, np.nan, block.astype(float))
+    names = np.asarray(CONDITION_LEVELS + [""], dtype=object)[block]
+
+    n = len(CONDITION_LEVELS)
+    colorscale = [
+        [edge / n, CONDITION_COLORS[i]]
+        for i in range(n) for edge in (i, i + 1)
+    ]
+
+    fig = go.Figure(go.Heatmap(
+        z=z, x=labels[lo:hi], y=stats, text=names,
+        zmin=-0.5, zmax=n - 0.5, colorscale=colorscale, xgap=1, ygap=1,
+        hovertemplate="%{y}<br>%{x}: %{text}<extra></extra>",
+        colorbar=dict(tickvals=list(range(n)), ticktext=CONDITION_LEVELS),
+    ))
+    fig.update_layout(
+        height=max(300, 22 * len(stats) + 120),
+        margin=dict(l=40, r=40, t=10, b=40),
+        xaxis=dict(type="category"),
+        yaxis=dict(autorange="reversed"),
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+    # Per-stat drill-down
+    st.markdown("### Statistic detail")
+    stat_name = st.selectbox("Select a statistic", stats, key="cond_history_stat")
+    row = stats.index(stat_name)
+
+    detail = pd.DataFrame({
+        "Week": labels[lo:hi],
+        "Condition": names[row],
+    })
+    entries = st.session_state.weekly_conditions.get(stat_name, {})
+    detail["Assigned to"] = detail["Week"].map(
+        lambda wk: entries.get(wk, {}).get("assigned_to", "")
+    )
+    detail["Battle plan steps"] = detail["Week"].map(
+        lambda wk: len(entries.get(wk, {}).get("battle_plan", []))
+    )
+    st.dataframe(detail.iloc[::-1].reset_index(drop=True), use_container_width=True)
 
 
 # =========================================================
@@ -1102,7 +1253,7 @@ with st.sidebar:
         ["All time", "Last 7 days", "Last 30 days", "Last 90 days", "Custom"],
     )
 
-    df_dates = st.session_state.df
+    df_dates = get_stats_df([])
     if "Date" in df_dates.columns and not df_dates.empty:
         dmin = df_dates["Date"].min().date()
         dmax = df_dates["Date"].max().date()
@@ -1113,13 +1264,25 @@ with st.sidebar:
     if date_range_label == "Custom":
         custom_range = st.date_input("Custom range", (dmin, dmax))
 
+    compare = st.selectbox(
+        "Compare to", COMPARE_OPTIONS, key="compare_mode",
+        help="Overlay the previous period or the same period last year on the Graphs page.",
+    )
+
     st.header("Conditions")
     conditions_view = st.radio(
-        "View", ["Off", "Table", "Battle Plans"],
+        "View", ["Off", "Table", "Battle Plans", "History"],
         index=0,
         key="conditions_view_radio"
     )
 
+    # Per-session memory footprint (for sizing containers)
+    if st.checkbox("Show session memory", key="show_memory"):
+        report = memory_report(st.session_state)
+        mode = f"compact {COMPACT_DTYPE}" if COMPACT_DTYPE else "DataFrame"
+        st.caption(f"{report['Bytes'].sum() / 1e6:.2f} MB held by this session ({mode})")
+        st.dataframe(report, use_container_width=True, height=220)
+
 
 # =========================================================
 #                           ROUTER
@@ -1129,8 +1292,10 @@ if conditions_view == "Table":
     page_conditions_table()
 elif conditions_view == "Battle Plans":
     page_conditions_battle_plans()
+elif conditions_view == "History":
+    page_conditions_history()
 else:
     if page == "Data table":
         page_data_table()
     else:
-        page_graphs(granularity, date_range_label, custom_range)
+        page_graphs(granularity, date_range_label, custom_range, compare)
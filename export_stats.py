@@ -0,0 +1,175 @@
+# export_stats.py
+"""
+CSV / Parquet / XLSX export of the stats (full history, one owner, or the
+Graphs page's filtered + resampled view).
+
+Files are written in row chunks straight to disk (CSV appends, Parquet row
+groups, write-only XLSX), so no session ever builds a whole export in
+memory. Finished files are cached under .exports/ per (view, data version,
+format) and shared by every session and the CLI.
+
+    python export_stats.py --format parquet --owner Alex -o alex.parquet
+    python export_stats.py --format xlsx --range "Last 90 days" --granularity Weekly
+"""
+import argparse
+import hashlib
+import os
+import pathlib
+import shutil
+import tempfile
+from typing import Callable, Dict, Tuple
+
+import pandas as pd
+
+from rpl_stats.rollups import filter_by_date, resample_df
+from rpl_stats.stats_store import (
+    BASE_DIR, STATS_BY_OWNER, compute_data_version, load_data, to_numeric_stat,
+)
+
+EXPORT_DIR = BASE_DIR / ".exports"
+CHUNK_ROWS = 50_000
+MAX_CACHED_EXPORTS = 64
+
+# label → (extension, mime type)
+EXPORT_FORMATS: Dict[str, Tuple[str, str]] = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "XLSX": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+
+# =========================================================
+#                     STREAMING WRITERS
+# =========================================================
+
+def prepare_export(df: pd.DataFrame) -> pd.DataFrame:
+    """Date first, every stat as a float column (so all formats agree)."""
+    out = {"Date": pd.to_datetime(df["Date"])}
+    for col in df.columns:
+        if col != "Date":
+            out[col] = to_numeric_stat(df[col])
+    return pd.DataFrame(out)
+
+
+def _chunks(df: pd.DataFrame):
+    """Export-ready row chunks; only one chunk is converted at a time."""
+    for start in range(0, len(df), CHUNK_ROWS):
+        yield prepare_export(df.iloc[start:start + CHUNK_ROWS])
+
+
+def _write_csv(df: pd.DataFrame, path: pathlib.Path) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        prepare_export(df.iloc[:0]).to_csv(fh, index=False)
+        for chunk in _chunks(df):
+            chunk.to_csv(fh, header=False, index=False, date_format="%Y-%m-%d")
+
+
+def _write_parquet(df: pd.DataFrame, path: pathlib.Path) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.Schema.from_pandas(prepare_export(df.iloc[:0]), preserve_index=False)
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in _chunks(df):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def _write_xlsx(df: pd.DataFrame, path: pathlib.Path) -> None:
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Stats")
+    ws.append(["Date"] + [str(c) for c in df.columns if c != "Date"])
+    for chunk in _chunks(df):
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        for row in chunk.itertuples(index=False, name=None):
+            ws.append(row)
+    wb.save(path)
+
+
+_WRITERS: Dict[str, Callable[[pd.DataFrame, pathlib.Path], None]] = {
+    "CSV": _write_csv,
+    "Parquet": _write_parquet,
+    "XLSX": _write_xlsx,
+}
+
+
+# =========================================================
+#                     CACHED EXPORTS
+# =========================================================
+
+def _evict_old_exports() -> None:
+    files = sorted(EXPORT_DIR.glob("*.*"), key=lambda p: p.stat().st_mtime)
+    for old in files[:-MAX_CACHED_EXPORTS]:
+        old.unlink(missing_ok=True)
+
+
+def export_file(df: pd.DataFrame, view_key: str, data_version: str, fmt: str) -> pathlib.Path:
+    """
+    Path of the `fmt` export of `df`. Reused when the same (view, data
+    version, format) was exported before; otherwise written chunk by chunk
+    to a temp file and moved into the cache atomically.
+    """
+    ext, _ = EXPORT_FORMATS[fmt]
+    digest = hashlib.sha1(f"{view_key}|{data_version}".encode()).hexdigest()[:20]
+    path = EXPORT_DIR / f"{digest}.{ext}"
+    if path.exists():
+        return path
+
+    EXPORT_DIR.mkdir(exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=EXPORT_DIR, suffix=".tmp")
+    os.close(fd)
+    try:
+        _WRITERS[fmt](df, pathlib.Path(tmp))
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    _evict_old_exports()
+    return path
+
+
+def export_name(view_label: str, fmt: str) -> str:
+    """Download file name, e.g. rpl-stats-alex.xlsx."""
+    slug = "-".join(view_label.lower().replace("'", "").split())
+    return f"rpl-stats-{slug}.{EXPORT_FORMATS[fmt][0]}"
+
+
+# =========================================================
+#                           CLI
+# =========================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export RPL stats")
+    parser.add_argument("--format", default="CSV", type=str.upper,
+                        choices=[f.upper() for f in EXPORT_FORMATS])
+    parser.add_argument("--owner", choices=list(STATS_BY_OWNER), help="only this owner's stats")
+    parser.add_argument("--range", default="All time",
+                        choices=["All time", "Last 7 days", "Last 30 days", "Last 90 days", "Custom"])
+    parser.add_argument("--start", help="custom range start (YYYY-MM-DD)")
+    parser.add_argument("--end", help="custom range end (YYYY-MM-DD)")
+    parser.add_argument("--granularity", default="Daily", choices=["Daily", "Weekly"])
+    parser.add_argument("-o", "--output", help="output path (default: ./rpl-stats-<view>.<ext>)")
+    args = parser.parse_args()
+
+    fmt = next(f for f in EXPORT_FORMATS if f.upper() == args.format)
+    df = load_data()
+    version = compute_data_version(df)
+
+    if args.owner:
+        df = df[["Date"] + [c for c in STATS_BY_OWNER[args.owner] if c in df.columns]]
+    custom = (args.start, args.end) if args.range == "Custom" else None
+    df = resample_df(filter_by_date(df, args.range, custom), args.granularity)
+
+    label = args.owner or "all"
+    key = f"cli|{label}|{args.range}|{custom}|{args.granularity}"
+    path = export_file(df, key, version, fmt)
+
+    output = args.output or export_name(label, fmt)
+    shutil.copyfile(path, output)
+    print(f"Wrote {len(df)} rows to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# import_stats.py
+"""
+Bulk import of historical stats (CSV / Excel / Parquet).
+
+Column names are matched onto MASTER_STATS ignoring case, padding and dash
+style; other columns are imported as-is. Rows are upserted by Date in one
+vectorised `combine_first` (blank cells never overwrite existing values) and
+formulas run once at the end.
+
+    python import_stats.py backfill.xlsx [--dry-run]
+"""
+import argparse
+import pathlib
+from typing import IO, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from alerts import run_alerts
+from rpl_stats.formulas import FORMULA_COLUMNS, apply_formulas
+from rpl_stats.stats_store import (
+    MASTER_STATS, canonical_stat_name, ensure_daily_rows, load_data, save_data,
+    to_numeric_stat,
+)
+
+IMPORT_TYPES = ["csv", "xlsx", "parquet"]
+
+# Extension → package its reader needs (listed in requirements.txt)
+READER_PACKAGES = {"xlsx": "openpyxl", "parquet": "pyarrow"}
+
+
+def read_import_file(source: str | pathlib.Path | IO, name: str | None = None) -> pd.DataFrame:
+    """Reads an upload or a path, picking the reader from the file extension."""
+    suffix = pathlib.Path(name or str(source)).suffix.lower().lstrip(".")
+    try:
+        if suffix == "csv":
+            return pd.read_csv(source)
+        if suffix == "xlsx":
+            return pd.read_excel(source, engine="openpyxl")
+        if suffix == "parquet":
+            return pd.read_parquet(source)
+    except ImportError as e:
+        raise ValueError(
+            f"Reading .{suffix} files needs {READER_PACKAGES.get(suffix, 'an extra package')} "
+            f"(pip install -r requirements.txt): {e}"
+        ) from e
+    raise ValueError(f"Unsupported file type: .{suffix} (use {', '.join(IMPORT_TYPES)})")
+
+
+def map_columns(raw: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Renames aliases onto MASTER_STATS / "Date", parses values to floats and
+    drops formula columns. Returns (frame, skipped column names).
+    """
+    lookup = {canonical_stat_name(c): c for c in ["Date"] + MASTER_STATS}
+
+    renamed = {}
+    for col in raw.columns:
+        target = lookup.get(canonical_stat_name(col), str(col).strip())
+        if target not in renamed.values():
+            renamed[col] = target
+
+    df = raw[list(renamed)].rename(columns=renamed)
+    if "Date" not in df.columns:
+        raise ValueError("Import file needs a Date column.")
+
+    skipped = [c for c in raw.columns if c not in renamed]
+    skipped += [c for c in df.columns if c in FORMULA_COLUMNS]
+    df = df.drop(columns=[c for c in df.columns if c in FORMULA_COLUMNS])
+
+    df["Date"] = pd.to_datetime(df["Date"], errors="coerce").dt.normalize()
+    df = df.dropna(subset=["Date"]).drop_duplicates("Date", keep="last")
+    for col in df.columns:
+        if col != "Date":
+            df[col] = to_numeric_stat(df[col])
+    return df, skipped
+
+
+def upsert_stats(base: pd.DataFrame, incoming: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Upserts `incoming` into `base` by Date and reapplies formulas once.
+    Returns (merged frame, per-column report of rows inserted / updated).
+    """
+    base_i = base.set_index("Date")
+    inc_i = incoming.set_index("Date")
+
+    # Per-column report, computed on the aligned blocks in one go
+    stats = list(inc_i.columns)
+    before = base_i.reindex(index=inc_i.index, columns=stats)
+    before = before.apply(to_numeric_stat).to_numpy()
+    after = inc_i[stats].to_numpy(dtype=float)
+
+    has_new = ~np.isnan(after)
+    had_old = ~np.isnan(before)
+    report = pd.DataFrame({
+        "Column": stats,
+        "Inserted": (has_new & ~had_old).sum(axis=0),
+        "Updated": (has_new & had_old & (after != before)).sum(axis=0),
+    })
+
+    merged = inc_i.combine_first(base_i)
+    columns = list(base_i.columns) + [c for c in stats if c not in base_i.columns]
+    merged = merged[columns].reset_index()
+
+    merged = ensure_daily_rows(merged)
+    for col in MASTER_STATS:
+        if col not in merged.columns:
+            merged[col] = None
+    merged = apply_formulas(merged)
+
+    return merged, report
+
+
+def import_file(source, name: str | None = None, base: pd.DataFrame | None = None
+                ) -> Tuple[pd.DataFrame, pd.DataFrame, List[str]]:
+    """read → map → upsert; returns (merged frame, report, skipped columns)."""
+    incoming, skipped = map_columns(read_import_file(source, name))
+    merged, report = upsert_stats(load_data() if base is None else base, incoming)
+    return merged, report, skipped
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk import stats into the stats table")
+    parser.add_argument("file", help=f"file to import ({', '.join(IMPORT_TYPES)})")
+    parser.add_argument("--dry-run", action="store_true", help="report only, don't save")
+    args = parser.parse_args()
+
+    try:
+        merged, report, skipped = import_file(args.file)
+    except ValueError as e:
+        parser.error(str(e))
+    print(report.to_string(index=False))
+    if skipped:
+        print("Skipped columns:", ", ".join(map(str, skipped)))
+
+    if not args.dry_run:
+        save_data(merged)
+        print(f"Saved {len(merged)} rows.")
+        alerts = run_alerts(merged)
+        print(f"{len(alerts)} alerts on the imported dates.")
+
+
+if __name__ == "__main__":
+    main()
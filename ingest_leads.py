@@ -0,0 +1,173 @@
+# ingest_leads.py
+"""
+Incremental ingestion of Supabase leads into the daily stats table.
+
+Run it from cron / a scheduler:
+
+    python ingest_leads.py                      # one incremental pass
+    python ingest_leads.py --every 300          # keep polling every 5 minutes
+    python ingest_leads.py --since 2025-06-01   # first run / backfill from a date
+
+Only leads created since the stored cursor are fetched, oldest first, a page
+at a time. Each page is counted per day with a single groupby, added onto the
+matching stat columns (formulas recomputed for the touched dates only) and
+saved before the cursor moves past it.
+"""
+import argparse
+import json
+import time
+from typing import Dict, Iterator, List, Tuple
+
+import pandas as pd
+
+from alerts import run_alerts
+from rpl_stats.formulas import apply_formulas_rows
+from rpl_stats.stats_store import BASE_DIR, MASTER_STATS, ensure_daily_rows, read_stats, save_data
+from supabase_client import get_leads_pages
+
+STATE_FILE = BASE_DIR / "ingest_state.json"
+
+# Stat column → lead filter ({} = every lead).
+# "Total Leads" / "Sellable Leads" follow from these via the formulas.
+LEAD_STAT_RULES: Dict[str, Dict[str, List[str]]] = {
+    "New Identities To CRM": {},
+    "Leads Delivered (Provisional)": {"status": ["delivered", "sold"]},
+}
+
+
+# =========================================================
+#                        CURSOR STATE
+# =========================================================
+
+def load_state() -> Dict:
+    """Cursor = newest `created` ingested + the lead ids seen at that instant."""
+    if STATE_FILE.exists():
+        try:
+            return json.loads(STATE_FILE.read_text())
+        except Exception:
+            pass
+    return {"cursor": None, "seen_ids": []}
+
+
+def save_state(state: Dict) -> None:
+    STATE_FILE.write_text(json.dumps(state, indent=2))
+
+
+# =========================================================
+#                   FETCH / AGGREGATE / MERGE
+# =========================================================
+
+def fetch_new_leads(state: Dict) -> Iterator[Tuple[pd.DataFrame, Dict]]:
+    """
+    Pages of leads created at/after the cursor that were not ingested yet,
+    oldest first, each with the cursor state to store once it is counted.
+    """
+    fields = sorted({f for rule in LEAD_STAT_RULES.values() for f in rule})
+    pages = get_leads_pages(state["cursor"], state["seen_ids"],
+                            columns=",".join(["id", "created"] + fields))
+    for page, cursor, seen in pages:
+        yield page, {"cursor": cursor, "seen_ids": seen}
+
+
+def aggregate_leads(batch: pd.DataFrame) -> pd.DataFrame:
+    """Per-day counts (Date index) for every LEAD_STAT_RULES column."""
+    day = pd.to_datetime(batch["created"], utc=True).dt.tz_localize(None).dt.normalize()
+
+    hits = pd.DataFrame(index=batch.index)
+    for stat, rule in LEAD_STAT_RULES.items():
+        match = pd.Series(True, index=batch.index)
+        for field, values in rule.items():
+            match &= batch[field].isin(values)
+        hits[stat] = match.astype(int)
+
+    counts = hits.groupby(day.to_numpy()).sum()
+    counts.index.name = "Date"
+    return counts
+
+
+def add_counts(df: pd.DataFrame, counts: pd.DataFrame) -> pd.DataFrame:
+    """Adds `counts` onto the matching Date rows (creating missing days)."""
+    missing = counts.index.difference(pd.DatetimeIndex(df["Date"]))
+    if len(missing):
+        df = ensure_daily_rows(pd.concat([df, pd.DataFrame({"Date": missing})], ignore_index=True))
+
+    rows = df["Date"].isin(counts.index).to_numpy()
+    aligned = counts.reindex(df.loc[rows, "Date"])
+
+    for stat in counts.columns:
+        if not pd.api.types.is_numeric_dtype(df[stat]):
+            df[stat] = pd.to_numeric(df[stat], errors="coerce")
+        current = df.loc[rows, stat].fillna(0).to_numpy()
+        df.loc[rows, stat] = current + aligned[stat].to_numpy()
+
+    return df
+
+
+def save_counts(counts: pd.DataFrame) -> pd.DataFrame:
+    """Adds `counts` onto the stored table and saves it; returns the saved table."""
+    stored = read_stats()
+    known = pd.DatetimeIndex(stored["Date"])
+    df = ensure_daily_rows(stored)
+    for col in MASTER_STATS:
+        if col not in df.columns:
+            df[col] = None
+
+    df = add_counts(df, counts)
+    added_days = df.loc[~df["Date"].isin(known), "Date"]
+    df = apply_formulas_rows(df, counts.index.union(pd.DatetimeIndex(added_days)))
+    save_data(df, base=stored)
+    return df
+
+
+# =========================================================
+#                          JOB
+# =========================================================
+
+def run_once(since: str | None = None) -> pd.DataFrame:
+    """One incremental pass; returns the per-day counts that were added."""
+    state = load_state()
+    if since is not None:
+        state = {"cursor": since, "seen_ids": []}
+    elif state["cursor"] is None:
+        # First run without a start point: only count leads from now on
+        state["cursor"] = pd.Timestamp.now(tz="UTC").isoformat()
+        save_state(state)
+        return pd.DataFrame()
+
+    added, df = [], None
+    for batch, next_state in fetch_new_leads(state):
+        counts = aggregate_leads(batch)
+        df = save_counts(counts)
+        # Only now past this page: a failed save leaves it to the next run
+        save_state(next_state)
+        added.append(counts)
+
+    if not added:
+        return pd.DataFrame()
+    run_alerts(df)
+    return pd.concat(added).groupby(level=0).sum()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ingest new Supabase leads into the stats table")
+    parser.add_argument("--since", help="ISO date/timestamp to (re)start from")
+    parser.add_argument("--every", type=int, default=0, help="poll every N seconds")
+    args = parser.parse_args()
+
+    since = args.since
+    while True:
+        counts = run_once(since)
+        since = None
+        if counts.empty:
+            print("No new leads.")
+        else:
+            for day, row in counts.iterrows():
+                print(day.strftime("%Y-%m-%d"), row.to_dict())
+
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
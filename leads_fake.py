@@ -0,0 +1,200 @@
+# leads_fake.py
+"""
+SQLite-backed stand-in for the Supabase client used by supabase_client.py.
+
+It implements the subset of the supabase-py interface the dashboard uses
+(`table(...).select/filters/order/limit/execute`, `insert` and `rpc`) and
+mirrors the SQL functions in sql/leads_rpc.sql, so the leads panel can be
+run and tested without the live service:
+
+    RPL_LEADS_DB=/tmp/leads.db streamlit run app.py
+"""
+import sqlite3
+import threading
+from typing import Any, Dict, List
+
+
+class _Response:
+    def __init__(self, data: List[Dict[str, Any]]):
+        self.data = data
+
+
+class _Query:
+    """Chainable query builder (select / filters / order / limit)."""
+
+    def __init__(self, client: "FakeSupabase", table: str):
+        self._client = client
+        self._table = table
+        self._columns = "*"
+        self._where: List[str] = []
+        self._params: List[Any] = []
+        self._order = ""
+        self._limit = ""
+        self._negate = False
+        self._insert: List[Dict[str, Any]] | None = None
+
+    def select(self, columns: str = "*") -> "_Query":
+        self._columns = columns
+        return self
+
+    def _add_where(self, clause: str) -> None:
+        self._where.append(f"NOT ({clause})" if self._negate else clause)
+        self._negate = False
+
+    @property
+    def not_(self) -> "_Query":
+        """Negates the next filter (`query.not_.in_(...)`)."""
+        self._negate = True
+        return self
+
+    def _filter(self, column: str, op: str, value) -> "_Query":
+        self._add_where(f'"{column}" {op} ?')
+        self._params.append(value)
+        return self
+
+    def eq(self, column: str, value) -> "_Query":
+        return self._filter(column, "=", value)
+
+    def gt(self, column: str, value) -> "_Query":
+        return self._filter(column, ">", value)
+
+    def gte(self, column: str, value) -> "_Query":
+        return self._filter(column, ">=", value)
+
+    def lt(self, column: str, value) -> "_Query":
+        return self._filter(column, "<", value)
+
+    def lte(self, column: str, value) -> "_Query":
+        return self._filter(column, "<=", value)
+
+    def in_(self, column: str, values) -> "_Query":
+        values = list(values)
+        self._add_where(f'"{column}" IN ({",".join("?" * len(values)) or "NULL"})')
+        self._params.extend(values)
+        return self
+
+    def order(self, column: str, desc: bool = False) -> "_Query":
+        self._order = f' ORDER BY "{column}" {"DESC" if desc else "ASC"}'
+        return self
+
+    def limit(self, n: int) -> "_Query":
+        self._limit = f" LIMIT {int(n)}"
+        return self
+
+    def insert(self, rows) -> "_Query":
+        self._insert = [rows] if isinstance(rows, dict) else list(rows)
+        return self
+
+    def execute(self) -> _Response:
+        if self._insert is not None:
+            return _Response(self._client._insert(self._table, self._insert))
+
+        cols = "*" if self._columns.strip() == "*" else ", ".join(
+            f'"{c.strip()}"' for c in self._columns.split(",")
+        )
+        sql = f'SELECT {cols} FROM "{self._table}"'
+        if self._where:
+            sql += " WHERE " + " AND ".join(self._where)
+        sql += self._order + self._limit
+        return _Response(self._client._query(sql, self._params))
+
+
+class _StaticQuery:
+    """RPC result wrapper so callers can `.execute()` like with supabase-py."""
+
+    def __init__(self, data: List[Dict[str, Any]]):
+        self._data = data
+
+    def execute(self) -> _Response:
+        return _Response(self._data)
+
+
+class FakeSupabase:
+    """Local SQLite database exposing the Supabase calls the dashboard makes."""
+
+    def __init__(self, path: str = ":memory:"):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS leads ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, created TEXT, "
+                "status TEXT, source TEXT, name TEXT, email TEXT, phone TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS leads_created_idx ON leads (created)")
+
+    # ---------------- supabase-py surface ----------------
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def rpc(self, name: str, params: Dict[str, Any]) -> _StaticQuery:
+        if name == "lead_counts":
+            return _StaticQuery(self._lead_counts(**params))
+        if name == "lead_filter_options":
+            return _StaticQuery(self._lead_filter_options())
+        raise ValueError(f"Unknown RPC: {name}")
+
+    # ---------------- internals ----------------
+
+    def _query(self, sql: str, params: List[Any]) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(sql, params).fetchall()]
+
+    def _insert(self, table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not rows:
+            return []
+        with self._lock, self._conn:
+            existing = {r[1] for r in self._conn.execute(f'PRAGMA table_info("{table}")')}
+            for col in {c for row in rows for c in row} - existing:
+                self._conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{col}"')
+
+            inserted = []
+            for row in rows:
+                cols = list(row)
+                quoted = ", ".join(f'"{c}"' for c in cols)
+                cur = self._conn.execute(
+                    f'INSERT INTO "{table}" ({quoted}) VALUES ({", ".join("?" * len(cols))})',
+                    [row[c] for c in cols],
+                )
+                inserted.append({**row, "id": row.get("id", cur.lastrowid)})
+            return inserted
+
+    def _lead_counts(self, start_date=None, end_date=None, statuses=None,
+                     sources=None, bucket="day", until_ts=None) -> List[Dict[str, Any]]:
+        # Week ends on Thursday (strftime %w: Sunday = 0 … Thursday = 4)
+        period = (
+            "date(created, '+' || ((4 - CAST(strftime('%w', created) AS INTEGER) + 7) % 7) || ' days')"
+            if bucket == "week" else "date(created)"
+        )
+        where, params = [], []
+        if start_date:
+            where.append("created >= ?")
+            params.append(start_date)
+        if end_date:
+            where.append("created < date(?, '+1 day')")
+            params.append(end_date)
+        if statuses:
+            where.append(f"status IN ({','.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if sources:
+            where.append(f"source IN ({','.join('?' * len(sources))})")
+            params.extend(sources)
+        if until_ts:
+            where.append("created <= ?")
+            params.append(until_ts)
+
+        sql = f"SELECT {period} AS period, COUNT(*) AS leads FROM leads"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " GROUP BY 1 ORDER BY 1"
+        return self._query(sql, params)
+
+    def _lead_filter_options(self) -> List[Dict[str, Any]]:
+        return self._query(
+            "SELECT DISTINCT 'status' AS field, status AS value FROM leads WHERE status IS NOT NULL "
+            "UNION ALL "
+            "SELECT DISTINCT 'source' AS field, source AS value FROM leads WHERE source IS NOT NULL",
+            [],
+        )
@@ -0,0 +1,229 @@
+# leads_feed.py
+"""
+Change feed of new Supabase leads for the dashboard's Live Leads panel.
+
+One LeadsFeed per server process polls the leads table with a `created`
+cursor (inclusive, plus the ids already seen at that instant), paging oldest
+first like ingest_leads.py, so a poll costs O(new rows) however large the
+table is and however many sessions are open. New rows go into a bounded buffer under
+increasing sequence numbers; every session keeps the sequence it is
+current to and appends what came after it to its cached leads table and
+counts (SessionLeads), without querying Supabase again.
+
+Supabase realtime would push instead, but supabase-py only offers it on the
+async client; polling works the same against the live table and the
+leads_fake.py stand-in.
+
+    RPL_LEADS_POLL_SECONDS=5     poll interval (default 5)
+"""
+import os
+import threading
+import time
+from collections import deque
+from datetime import date
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+from supabase_client import get_lead_counts, get_leads_df, get_leads_pages
+
+POLL_SECONDS = float(os.environ.get("RPL_LEADS_POLL_SECONDS", "5"))
+
+# Rows kept for sessions to catch up from; a session further behind reloads
+BUFFER_ROWS = 5000
+
+
+# =========================================================
+#                 CLIENT-SIDE FILTERS / COUNTS
+# =========================================================
+
+def _created(rows: pd.DataFrame) -> pd.Series:
+    return pd.to_datetime(rows["created"], utc=True).dt.tz_localize(None)
+
+
+def filter_leads(rows: pd.DataFrame, start: date | None = None, end: date | None = None,
+                 statuses: List[str] | None = None, sources: List[str] | None = None
+                 ) -> pd.DataFrame:
+    """The rows get_leads_df would return for the same filters (`end` inclusive)."""
+    if rows.empty:
+        return rows
+    keep = pd.Series(True, index=rows.index)
+    created = _created(rows)
+    if start is not None:
+        keep &= created >= pd.Timestamp(start)
+    if end is not None:
+        keep &= created < pd.Timestamp(end) + pd.Timedelta(days=1)
+    if statuses:
+        keep &= rows["status"].isin(statuses)
+    if sources:
+        keep &= rows["source"].isin(sources)
+    return rows[keep]
+
+
+def count_leads(rows: pd.DataFrame, bucket: str = "day") -> pd.DataFrame:
+    """Per-period counts like get_lead_counts (weeks end on Thursday)."""
+    period = _created(rows).dt.normalize()
+    if bucket == "week":
+        period = period + pd.to_timedelta((3 - period.dt.weekday) % 7, unit="D")
+    return period.value_counts().rename_axis("period").reset_index(name="leads")
+
+
+def merge_counts(counts: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """`counts` with `new` added per period."""
+    if new.empty:
+        return counts
+    merged = pd.concat([counts, new], ignore_index=True)
+    return merged.groupby("period", as_index=False)["leads"].sum().sort_values("period")
+
+
+def extend_filter_options(options: Dict[str, List[str]], rows: pd.DataFrame) -> Dict[str, List[str]]:
+    """Filter options with any status / source first seen in `rows`."""
+    return {
+        field: sorted(set(values) | set(rows[field].dropna()))
+        if field in rows.columns else values
+        for field, values in options.items()
+    }
+
+
+# =========================================================
+#                  PROCESS-WIDE POLLING FEED
+# =========================================================
+
+class LeadsFeed:
+    """Polls for leads created since its cursor and buffers them in order."""
+
+    def __init__(self, poll_seconds: float = POLL_SECONDS, buffer_rows: int = BUFFER_ROWS):
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._rows: deque = deque(maxlen=buffer_rows)  # (seq, row dict), oldest first
+        self._seq = 0
+        self._cursor: str | None = None
+        self._seen_ids: List = []
+        self._ready = False
+
+    @property
+    def seq(self) -> int:
+        """Sequence number of the newest buffered row (0 before any)."""
+        with self._lock:
+            return self._seq
+
+    def position(self) -> Tuple[int, str | None]:
+        """
+        (seq, cursor) read together: every lead created up to the cursor
+        was there before `seq`, every later one is buffered after it.
+        """
+        with self._lock:
+            return self._seq, self._cursor
+
+    def start_cursor(self) -> None:
+        """Starts the cursor at the newest existing lead (new leads only from here)."""
+        newest = get_leads_df(columns="id,created", limit=1)
+        if not newest.empty:
+            cursor = newest["created"].iloc[0]
+            at_cursor = get_leads_df(columns="id,created", since=cursor)
+            with self._lock:
+                self._cursor = cursor
+            self._seen_ids = at_cursor.loc[at_cursor["created"] == cursor, "id"].tolist()
+        self._ready = True
+
+    def poll(self) -> int:
+        """Fetches leads created since the cursor into the buffer; returns how many."""
+        if not self._ready:
+            self.start_cursor()
+        added = 0
+        for page, cursor, seen in get_leads_pages(self._cursor, self._seen_ids):
+            rows = page.to_dict(orient="records")  # oldest first
+            self._seen_ids = seen
+            with self._lock:
+                self._cursor = cursor
+                for row in rows:
+                    self._seq += 1
+                    self._rows.append((self._seq, row))
+            added += len(rows)
+        return added
+
+    def since(self, seq: int) -> Tuple[pd.DataFrame | None, int]:
+        """
+        (rows buffered after `seq`, newest first; current seq). Rows are None
+        when `seq` has already left the buffer and the caller must reload.
+        """
+        with self._lock:
+            if seq >= self._seq:
+                return pd.DataFrame(), self._seq
+            if not self._rows or self._rows[0][0] > seq + 1:
+                return None, self._seq
+            rows = [row for s, row in reversed(self._rows) if s > seq]
+            return pd.DataFrame(rows), self._seq
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.poll()
+            except Exception:
+                pass  # Supabase unreachable: try again next interval
+            time.sleep(self.poll_seconds)
+
+    def start(self) -> None:
+        threading.Thread(target=self._run, daemon=True, name="rpl-leads-feed").start()
+
+
+_FEED: LeadsFeed | None = None
+_FEED_LOCK = threading.Lock()
+
+
+def leads_feed() -> LeadsFeed:
+    """The process-wide feed, polling in the background from the first call."""
+    global _FEED
+    with _FEED_LOCK:
+        if _FEED is None:
+            _FEED = LeadsFeed()
+            try:
+                # Before any session loads, so no lead falls between the two
+                _FEED.start_cursor()
+            except Exception:
+                pass  # the poller retries
+            _FEED.start()
+        return _FEED
+
+
+# =========================================================
+#                    PER-SESSION LEADS CACHE
+# =========================================================
+
+class SessionLeads:
+    """
+    One session's Live Leads data for a set of filters: the newest `limit`
+    matching rows and the per-period counts, plus the feed sequence they are
+    current to. Loaded with one query each, then kept current from the feed.
+    """
+
+    def __init__(self, filters: Dict, bucket: str, limit: int, feed: LeadsFeed):
+        self.filters, self.bucket, self.limit = filters, bucket, limit
+        self._load(feed)
+
+    def _load(self, feed: LeadsFeed) -> None:
+        # Both queries stop at the feed's cursor: later rows come only from
+        # the feed, so nothing is counted twice
+        self.seq, cursor = feed.position()
+        self.rows = get_leads_df(**self.filters, limit=self.limit, until=cursor)
+        self.counts = get_lead_counts(**self.filters, bucket=self.bucket, until=cursor)
+
+    def matches(self, filters: Dict, bucket: str) -> bool:
+        return filters == self.filters and bucket == self.bucket
+
+    def refresh(self, feed: LeadsFeed) -> pd.DataFrame:
+        """Appends the matching feed rows since the last refresh; returns them."""
+        new, seq = feed.since(self.seq)
+        if new is None:
+            self._load(feed)
+            return pd.DataFrame()
+        self.seq = seq
+
+        new = filter_leads(new, **self.filters)
+        if not new.empty and "id" in self.rows.columns:
+            new = new[~new["id"].isin(self.rows["id"])]
+        if new.empty:
+            return new
+        self.rows = pd.concat([new, self.rows], ignore_index=True).head(self.limit)
+        self.counts = merge_counts(self.counts, count_leads(new, self.bucket))
+        return new
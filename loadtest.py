@@ -0,0 +1,350 @@
+# loadtest.py
+"""
+Offline load test: N concurrent dashboard sessions in one process, the way
+a single Streamlit container serves them.
+
+Each session is a streamlit.testing AppTest driving a scratch copy of the
+app (the real stats files are never touched), with the leads panel on the
+SQLite stand-in from leads_fake.py. Sessions log in through the login form
+and then run a random mix of actions: switching saved Graphs views,
+changing the date range and editing cells in the data table. Every edit
+goes to a distinct cell with a distinct value, so at the end the stored
+table shows exactly which saved edits were lost to concurrent saves; edits the
+app never confirmed ("Stats saved" toast) are counted as dropped.
+
+Reports per-action latency percentiles, process memory growth, app
+exceptions and lost writes.
+
+    python loadtest.py --sessions 8 --actions 20
+    RPL_COMPACT_STATS=float32 python loadtest.py --sessions 16 --keep
+    RPL_STATE_BACKEND=memory python loadtest.py      # key-value store fake
+"""
+import argparse
+import ast
+import os
+import pathlib
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent
+
+COPY_IGNORE = shutil.ignore_patterns(
+    ".git", "__pycache__", ".exports", "stats_history", "alerts_log.csv",
+    "alerts_state.json", "ingest_state.json", "requests.jsonl", "*.db", "*.db-*",
+)
+
+ACTIONS = ["switch view", "date range", "edit cell"]
+DATE_RANGES = ["All time", "Last 7 days", "Last 30 days", "Last 90 days"]
+
+
+# =========================================================
+#                       SCRATCH COPY
+# =========================================================
+
+def prepare_workdir(workdir: pathlib.Path, leads: int) -> None:
+    """Copies the app into `workdir` and seeds a fake leads database."""
+    shutil.copytree(BASE_DIR, workdir, ignore=COPY_IGNORE, dirs_exist_ok=True)
+
+    # Imported from the copy, so every store path points inside it
+    sys.path.insert(0, str(workdir))
+    from leads_fake import FakeSupabase
+
+    db = workdir / "leads.db"
+    rng = random.Random(0)
+    now = pd.Timestamp.now()
+    FakeSupabase(str(db)).table("leads").insert([
+        {
+            "created": (now - pd.Timedelta(minutes=rng.randrange(90 * 24 * 60))).isoformat(),
+            "status": rng.choice(["new", "sellable", "delivered", "rejected"]),
+            "source": rng.choice(["google", "facebook", "referral"]),
+            "name": f"Lead {i}",
+        }
+        for i in range(leads)
+    ]).execute()
+    os.environ["RPL_LEADS_DB"] = str(db)
+    # Shared state store inside the copy too (seeded from its CSV / JSON files)
+    os.environ["RPL_STATE_DB"] = str(workdir / "rpl_state.db")
+
+
+def credentials(app_file: pathlib.Path) -> Tuple[List[str], str]:
+    """(allowed emails, raw password) read from the app's login constants."""
+    users, password = [], ""
+    for node in ast.parse(app_file.read_text()).body:
+        if isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name):
+            name = node.targets[0].id
+            if name == "RAW_PASSWORD":
+                password = ast.literal_eval(node.value)
+            elif name == "ALLOWED_USERS":
+                users = [ast.literal_eval(k) for k in node.value.keys]
+    return users, password
+
+
+def allow_concurrent_apptests() -> None:
+    """
+    AppTest is written for one test at a time; two process-wide details
+    break when sessions run on threads, so they are pinned here:
+
+    * each run patches config.get_option to report "global.appTest" and
+      restores it afterwards, which switches it off under a run still in
+      progress on another thread (its widgets then can't be driven) —
+      the option is forced on for the whole load test instead;
+    * each AppTest compiles the script itself, and CPython < 3.12 can fail
+      ("AST constructor recursion depth mismatch") when threads run
+      ast.parse at the same time — parsing (only) is serialised.
+    """
+    from streamlit import config
+
+    get_option = config.get_option
+    config.get_option = lambda name: True if name == "global.appTest" else get_option(name)
+
+    if sys.version_info < (3, 12):
+        parse = ast.parse
+        lock = threading.Lock()
+
+        def locked_parse(*args, **kwargs):
+            with lock:
+                return parse(*args, **kwargs)
+
+        ast.parse = locked_parse
+
+
+def rss_mb() -> float:
+    """Current resident memory of this process (peak where /proc is missing)."""
+    statm = pathlib.Path("/proc/self/statm")
+    if statm.exists():
+        return int(statm.read_text().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+# =========================================================
+#                     SIMULATED SESSION
+# =========================================================
+
+class Recorder:
+    """Timings, errors and edits shared by all sessions."""
+
+    def __init__(self, cells: List[Tuple[int, str]]):
+        self.lock = threading.Lock()
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+        self.errors: List[str] = []
+        self.edits: List[Dict] = []
+        self._cells = iter(cells)
+
+    def next_cell(self) -> Tuple[int, Tuple[int, str]]:
+        with self.lock:
+            return len(self.edits), next(self._cells)
+
+
+class Session:
+    def __init__(self, n: int, app_file: pathlib.Path, recorder: Recorder, seed: int):
+        from streamlit.testing.v1 import AppTest
+
+        self.n = n
+        self.at = AppTest.from_file(str(app_file), default_timeout=300)
+        self.rec = recorder
+        self.rng = random.Random(seed + n)
+
+    def timed(self, action: str, step) -> None:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            with self.rec.lock:
+                self.rec.errors.append(f"session {self.n} · {action}: {e!r}")
+            return
+        elapsed = time.perf_counter() - start
+        with self.rec.lock:
+            self.rec.timings[action].append(elapsed)
+            for exc in self.at.exception:
+                self.rec.errors.append(f"session {self.n} · {action}: {exc.message}")
+
+    def _widget(self, widgets, label: str):
+        for widget in widgets:
+            if widget.label == label:
+                return widget
+        raise LookupError(f"no {label!r} widget on the page")
+
+    def _page(self, page: str) -> None:
+        radio = self._widget(self.at.sidebar.radio, "Page")
+        if radio.value != page:
+            self.timed("navigate", lambda: radio.set_value(page).run())
+
+    # ---------------- actions ----------------
+
+    def login(self, email: str, password: str) -> None:
+        def step():
+            self.at.run()
+            self._widget(self.at.text_input, "Email").input(email)
+            self._widget(self.at.text_input, "Password").input(password)
+            self._widget(self.at.button, "Login").click().run()
+            if not self.at.session_state.logged_in:
+                raise RuntimeError("login rejected")
+        self.timed("login", step)
+
+    def switch_view(self) -> None:
+        self._page("Graphs")
+        radio = self._widget(self.at.radio, "Saved views")
+        choice = self.rng.choice([o for o in radio.options if o != radio.value])
+        self.timed("switch view", lambda: radio.set_value(choice).run())
+
+    def date_range(self) -> None:
+        box = self._widget(self.at.sidebar.selectbox, "Date range")
+        choice = self.rng.choice([o for o in DATE_RANGES if o != box.value])
+        self.timed("date range", lambda: box.set_value(choice).run())
+
+    def edit_cell(self, dates: pd.DatetimeIndex) -> None:
+        self._page("Data table")
+        try:
+            k, (row, stat) = self.rec.next_cell()
+        except StopIteration:
+            return
+        value = float(900_000 + k)
+        edit = {"session": self.n, "Date": dates[row], "Statistic": stat, "Value": value}
+
+        def step():
+            self.at.session_state["rpl_editor"] = {
+                "edited_rows": {row: {stat: value}}, "added_rows": [], "deleted_rows": [],
+            }
+            self.at.run()
+            edit["acked"] = any("Stats saved" in str(t.value) for t in self.at.toast)
+
+        with self.rec.lock:
+            self.rec.edits.append(edit)
+        self.timed("edit cell", step)
+
+    def run(self, email: str, password: str, actions: int, think: float,
+            dates: pd.DatetimeIndex) -> None:
+        self.login(email, password)
+        for _ in range(actions):
+            action = self.rng.choice(ACTIONS)
+            try:
+                if action == "switch view":
+                    self.switch_view()
+                elif action == "date range":
+                    self.date_range()
+                else:
+                    self.edit_cell(dates)
+            except LookupError as e:
+                # The last run failed and left no widgets: rerun, like a refresh
+                with self.rec.lock:
+                    self.rec.errors.append(f"session {self.n} · {action}: {e}")
+                self.timed("recover", self.at.run)
+            if think:
+                time.sleep(self.rng.uniform(0, 2 * think))
+
+
+# =========================================================
+#                          REPORT
+# =========================================================
+
+def latency_table(timings: Dict[str, List[float]]) -> pd.DataFrame:
+    rows = []
+    for action, values in sorted(timings.items()):
+        ms = np.asarray(values) * 1000
+        rows.append({
+            "Action": action,
+            "Count": len(ms),
+            "p50 ms": np.percentile(ms, 50),
+            "p90 ms": np.percentile(ms, 90),
+            "p99 ms": np.percentile(ms, 99),
+            "Max ms": ms.max(),
+        })
+    return pd.DataFrame(rows).round(1)
+
+
+def lost_writes(edits: List[Dict], saved: pd.DataFrame) -> pd.DataFrame:
+    """Acknowledged edits whose value isn't in the saved stats."""
+    saved = saved.dropna(subset=["Date"]).set_index("Date")
+    lost = []
+    for edit in edits:
+        if not edit.get("acked"):
+            continue
+        found = saved[edit["Statistic"]].get(edit["Date"]) if edit["Statistic"] in saved else None
+        if found is None or pd.isna(found) or float(found) != edit["Value"]:
+            lost.append({**edit, "Saved value": found})
+    return pd.DataFrame(lost)
+
+
+def run_load_test(args: argparse.Namespace, workdir: pathlib.Path) -> None:
+    """Runs every session to completion on `workdir` and prints the report."""
+    prepare_workdir(workdir, args.leads)
+    allow_concurrent_apptests()
+
+    from rpl_stats.formulas import FORMULA_COLUMNS
+    from rpl_stats.stats_store import MASTER_STATS, load_data, read_stats
+
+    dates = pd.DatetimeIndex(load_data()["Date"])
+    stats = [s for s in MASTER_STATS if s not in FORMULA_COLUMNS]
+    cells = [(row, stat) for row in range(len(dates)) for stat in stats]
+    random.Random(args.seed).shuffle(cells)
+
+    users, password = credentials(workdir / "app.py")
+    recorder = Recorder(cells)
+    rss_start = rss_mb()
+
+    sessions = [Session(n, workdir / "app.py", recorder, args.seed) for n in range(args.sessions)]
+    print(f"{args.sessions} sessions × {args.actions} actions on {workdir}")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        jobs = [
+            pool.submit(s.run, users[s.n % len(users)], password, args.actions, args.think, dates)
+            for s in sessions
+        ]
+        for job in jobs:
+            job.result()
+    wall = time.perf_counter() - started
+    rss_end = rss_mb()
+
+    print()
+    print(latency_table(recorder.timings).to_string(index=False))
+    print()
+    print(f"Wall time:   {wall:.1f} s")
+    print(f"Memory:      {rss_start:.0f} MB → {rss_end:.0f} MB "
+          f"(+{(rss_end - rss_start) / args.sessions:.1f} MB per session)")
+
+    acked = sum(1 for e in recorder.edits if e.get("acked"))
+    lost = lost_writes(recorder.edits, read_stats())
+    print(f"Edits:       {len(recorder.edits)} sent, {acked} saved "
+          f"({len(recorder.edits) - acked} dropped before saving), {len(lost)} lost after saving")
+    if not lost.empty:
+        print(lost[["session", "Date", "Statistic", "Value", "Saved value"]].to_string(index=False))
+
+    print(f"Exceptions:  {len(recorder.errors)}")
+    for error in recorder.errors[:20]:
+        print("  " + error)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline multi-session load test of the dashboard")
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--actions", type=int, default=20, help="actions per session after login")
+    parser.add_argument("--think", type=float, default=0.0, help="mean pause between actions (s)")
+    parser.add_argument("--leads", type=int, default=2000, help="rows in the fake leads table")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch copy")
+    args = parser.parse_args()
+
+    workdir = pathlib.Path(tempfile.mkdtemp(prefix="rpl-loadtest-"))
+    try:
+        run_load_test(args, workdir)
+    finally:
+        if args.keep:
+            print(f"\nScratch copy kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
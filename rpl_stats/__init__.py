@@ -0,0 +1,62 @@
+# rpl_stats/__init__.py
+"""
+Core library behind the dashboard, importable without Streamlit:
+
+    backend        shared state store (SQLite WAL / files / key-value) + change watch
+    stats_store    stats schema, stats table, saved views, chart colours
+    formulas       derived-column formulas (full and incremental)
+    edits          row-hash change detection + cell write-back for the editor
+    rollups        date filtering, weekly resampling, rolling overlays
+    conditions     weekly conditions store, suggestions, battle-plan aggregates
+    compact_stats  opt-in single-block stats storage + memory reporting
+    snapshots      versioned stats history (checkpoints + deltas), "as of" reads
+
+The names below are re-exported lazily, so `import rpl_stats` itself loads
+nothing heavy; each submodule (and pandas) is imported on first use.
+`python -m rpl_stats` reports cold import times.
+"""
+import importlib
+
+_EXPORTS = {
+    "backend": ["StateBackend", "revision", "watch"],
+    "stats_store": [
+        "BASE_DIR", "DATA_FILE", "MASTER_STATS", "STATS_BY_OWNER",
+        "canonical_stat_name", "compute_data_version", "data_revision",
+        "ensure_daily_rows", "load_data", "load_saved_views", "read_stats",
+        "save_data", "save_saved_views", "to_numeric_stat",
+    ],
+    "formulas": [
+        "FORMULA_COLUMNS", "ROW_FORMULA_COLUMNS", "apply_formulas", "apply_formulas_rows",
+    ],
+    "edits": ["apply_cell_edits", "editor_cells", "row_hashes"],
+    "rollups": [
+        "COMPARE_OPTIONS", "OVERLAYS", "OVERLAY_OPTIONS", "comparison_summary",
+        "filter_by_date", "overlay_frame", "range_aggregate", "resample_df",
+        "window_metrics",
+    ],
+    "conditions": [
+        "CONDITION_LEVELS", "load_conditions", "save_conditions",
+        "suggest_conditions", "condition_labels",
+    ],
+    "compact_stats": ["CompactStats", "memory_report"],
+    "snapshots": [
+        "list_versions", "record_version", "stats_as_of", "stats_version", "version_labels",
+    ],
+}
+
+_MODULE_OF = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_MODULE_OF)
+
+
+def __getattr__(name: str):
+    module = _MODULE_OF.get(name)
+    if module is None:
+        raise AttributeError(f"module 'rpl_stats' has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
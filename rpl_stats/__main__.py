@@ -0,0 +1,57 @@
+# rpl_stats/__main__.py
+"""
+Cold import time of the core modules, each measured with -X importtime in a
+fresh interpreter (best of --repeat runs), split into numpy/pandas and the
+package's own code:
+
+    python -m rpl_stats [--repeat 5]
+"""
+import argparse
+import subprocess
+import sys
+from typing import Dict, Tuple
+
+MODULES = [
+    "rpl_stats",
+    "rpl_stats.formulas", "rpl_stats.stats_store", "rpl_stats.rollups",
+    "rpl_stats.conditions", "rpl_stats.compact_stats",
+]
+
+
+def _cumulative_us(module: str) -> Dict[str, Tuple[int, int]]:
+    """{imported module: (tree depth, cumulative µs)} for one fresh `import module`."""
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+    ).stderr
+    out = {}
+    for line in err.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            name = parts[2].rstrip()
+            depth = len(name) - len(name.lstrip())
+            out.setdefault(name.strip(), (depth, int(parts[1])))
+    return out
+
+
+def import_ms(module: str, repeat: int) -> Tuple[float, float]:
+    """(total, numpy + pandas share) in ms for the fastest of `repeat` cold imports."""
+    best = min((_cumulative_us(module) for _ in range(repeat)), key=lambda t: t[module][1])
+    deps = [best[m] for m in ("numpy", "pandas") if m in best]
+    top = min((depth for depth, _ in deps), default=0)
+    return best[module][1] / 1000, sum(us for depth, us in deps if depth == top) / 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure rpl_stats import times")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'module':<26} {'total':>9} {'np/pd':>9} {'own':>8}")
+    for module in MODULES:
+        total, deps = import_ms(module, args.repeat)
+        print(f"{module:<26} {total:7.1f}ms {deps:7.1f}ms {total - deps:6.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
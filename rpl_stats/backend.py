@@ -0,0 +1,583 @@
+# rpl_stats/backend.py
+"""
+Shared state store for the stats table and the JSON documents (saved views,
+chart colours, weekly conditions), so several dashboard / API worker
+processes can serve the same data:
+
+    RPL_STATE_BACKEND=sqlite      (default) SQLite in WAL mode at RPL_STATE_DB
+                                  (default rpl_state.db next to app.py)
+    RPL_STATE_BACKEND=files       the legacy stats_data.csv / *.json files
+                                  (single process only)
+    RPL_STATE_BACKEND=memory      in-process stand-in for a networked
+                                  key-value store (tests, load tests)
+    RPL_STATE_BACKEND=redis://…   a Redis server (needs the redis package)
+
+Writes are cell / key level: save_data sends only the cells that differ from
+the frame the writer started from, and documents are merged key by key
+under the store's write lock, so writers touching different cells or
+entries don't clobber each other. Every write bumps a per-name revision in
+the same transaction. Readers compare revisions to invalidate their caches
+(on SQLite an unchanged `PRAGMA data_version` skips even that query), and
+watch() calls back from a background thread when another process writes.
+
+An empty SQLite / key-value store is seeded from the legacy files on first
+use, in one transaction, so concurrently starting workers seed it once.
+"""
+import json
+import os
+from abc import ABC, abstractmethod
+import pathlib
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+
+STATS = "stats"
+DOCUMENTS = ("views", "colors", "conditions")
+
+LEGACY_FILES = {
+    STATS: BASE_DIR / "stats_data.csv",
+    "views": BASE_DIR / "saved_views.json",
+    "colors": BASE_DIR / "stats_colors.json",
+    "conditions": BASE_DIR / "weekly_conditions.json",
+}
+
+STATE_DB = pathlib.Path(os.environ.get("RPL_STATE_DB", BASE_DIR / "rpl_state.db"))
+
+WATCH_SECONDS = 1.0
+
+# (Date as YYYY-MM-DD, statistic, value); a None value clears the cell
+Cell = Tuple[str, str, object]
+
+
+# =========================================================
+#                   CELL / DOCUMENT HELPERS
+# =========================================================
+
+def cells_to_frame(columns: List[str], cells: List[Cell]) -> pd.DataFrame:
+    """Wide stats frame (Date as text, `columns` in order) from long cells."""
+    if not cells:
+        return pd.DataFrame(columns=["Date", *columns])
+    long = pd.DataFrame(cells, columns=["Date", "Statistic", "Value"])
+    wide = long.pivot(index="Date", columns="Statistic", values="Value")
+    wide = wide.reindex(columns=columns).sort_index().reset_index()
+    for col in columns:
+        # Numbers come back as numbers, like read_csv would infer them
+        numeric = pd.to_numeric(wide[col], errors="coerce")
+        if numeric.notna().sum() == wide[col].notna().sum():
+            wide[col] = numeric
+        else:
+            wide[col] = wide[col].infer_objects()
+    return wide
+
+
+def frame_to_cells(df: pd.DataFrame) -> List[Cell]:
+    """Non-empty cells of a wide frame as read from the legacy CSV."""
+    df = df.assign(Date=pd.to_datetime(df["Date"], errors="coerce").dt.strftime("%Y-%m-%d"))
+    long = df.melt(id_vars="Date", var_name="Statistic", value_name="Value").dropna()
+    return [(str(d), str(s), _plain(v)) for d, s, v in long.itertuples(index=False)]
+
+
+def _plain(value):
+    """Python scalar for storage (numpy numbers → int / float)."""
+    return value.item() if hasattr(value, "item") else value
+
+
+def merge_changes(current: Dict, base: Dict, new: Dict) -> Dict:
+    """
+    `current` plus the edits that turned `base` into `new`: changed keys are
+    set, removed keys dropped, and nested dicts merged the same way, so
+    entries another writer changed meanwhile are kept.
+    """
+    out = dict(current)
+    for key in base.keys() - new.keys():
+        out.pop(key, None)
+    for key, value in new.items():
+        old = base.get(key)
+        if isinstance(value, dict) and isinstance(old, dict) and isinstance(out.get(key), dict):
+            out[key] = merge_changes(out[key], old, value)
+        elif key not in base or value != old:
+            out[key] = value
+    return out
+
+
+# =========================================================
+#                        INTERFACE
+# =========================================================
+
+class StateBackend(ABC):
+    """What a shared store provides. Revisions are per name (STATS, DOCUMENTS)."""
+
+    @abstractmethod
+    def read_stats(self) -> pd.DataFrame:
+        """Wide stats frame as stored (Date as text)."""
+
+    @abstractmethod
+    def write_cells(self, cells: List[Cell], columns: List[str]) -> int:
+        """
+        Upserts `cells` and appends any of `columns` not stored yet to the
+        column order. Returns the new stats revision.
+        """
+
+    @abstractmethod
+    def read_document(self, name: str) -> Dict:
+        """Document `name` ({} when never written)."""
+
+    @abstractmethod
+    def update_document(self, name: str, update: Callable[[Dict], Dict | None]) -> Tuple[Dict, int]:
+        """
+        Atomically replaces document `name` with update(current) and returns
+        (stored body, revision). When update returns None nothing is written
+        and the current body and revision come back.
+        """
+
+    @abstractmethod
+    def revisions(self) -> Dict[str, int]:
+        """{name: revision}; every write bumps its name's revision by one."""
+
+    def seed(self, cells: List[Cell], columns: List[str], documents: Dict[str, Dict]) -> bool:
+        """
+        Writes an initial state if the store is still empty, atomically with
+        that check. Returns whether it did; stores that are the legacy files
+        themselves keep this no-op.
+        """
+        return False
+
+    def is_empty(self) -> bool:
+        return not any(self.revisions().values())
+
+
+# =========================================================
+#                   SQLITE (WAL) BACKEND
+# =========================================================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cells (
+    date TEXT NOT NULL, stat TEXT NOT NULL, value,
+    PRIMARY KEY (date, stat)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stat_columns (pos INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL);
+CREATE TABLE IF NOT EXISTS documents (name TEXT PRIMARY KEY, body TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS revisions (name TEXT PRIMARY KEY, rev INTEGER NOT NULL);
+"""
+
+
+class SQLiteBackend(StateBackend):
+    """
+    One connection per thread, WAL journal (readers never block the writer),
+    writes in BEGIN IMMEDIATE transactions with a busy timeout.
+    """
+
+    def __init__(self, path: pathlib.Path):
+        self.path = pathlib.Path(path)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.data_version = None
+        return conn
+
+    def _write(self, body: Callable[[sqlite3.Connection], object]):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = body(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        # Our own commits don't move data_version; force a re-read
+        self._local.data_version = None
+        return result
+
+    @staticmethod
+    def _bump(conn: sqlite3.Connection, name: str) -> int:
+        conn.execute(
+            "INSERT INTO revisions VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET rev = rev + 1", (name,))
+        return conn.execute("SELECT rev FROM revisions WHERE name = ?", (name,)).fetchone()[0]
+
+    def read_stats(self) -> pd.DataFrame:
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            columns = [r[0] for r in conn.execute("SELECT name FROM stat_columns ORDER BY pos")]
+            cells = conn.execute("SELECT date, stat, value FROM cells").fetchall()
+        finally:
+            conn.execute("COMMIT")
+        return cells_to_frame(columns, cells)
+
+    @classmethod
+    def _put_cells(cls, conn: sqlite3.Connection, cells: List[Cell], columns: List[str]) -> int:
+        known = {r[0] for r in conn.execute("SELECT name FROM stat_columns")}
+        conn.executemany("INSERT INTO stat_columns (name) VALUES (?)",
+                         [(c,) for c in dict.fromkeys(columns) if c not in known])
+        conn.executemany(
+            "INSERT INTO cells VALUES (?, ?, ?) "
+            "ON CONFLICT(date, stat) DO UPDATE SET value = excluded.value",
+            [c for c in cells if c[2] is not None])
+        conn.executemany("DELETE FROM cells WHERE date = ? AND stat = ?",
+                         [c[:2] for c in cells if c[2] is None])
+        return cls._bump(conn, STATS)
+
+    @classmethod
+    def _put_document(cls, conn: sqlite3.Connection, name: str, body: Dict) -> int:
+        conn.execute("INSERT OR REPLACE INTO documents VALUES (?, ?)", (name, json.dumps(body)))
+        return cls._bump(conn, name)
+
+    def write_cells(self, cells: List[Cell], columns: List[str]) -> int:
+        return self._write(lambda conn: self._put_cells(conn, cells, columns))
+
+    def read_document(self, name: str) -> Dict:
+        row = self._conn().execute("SELECT body FROM documents WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def update_document(self, name: str, update: Callable[[Dict], Dict | None]) -> Tuple[Dict, int]:
+        def body(conn):
+            row = conn.execute("SELECT body FROM documents WHERE name = ?", (name,)).fetchone()
+            current = json.loads(row[0]) if row else {}
+            new = update(current)
+            if new is None:
+                rev = conn.execute("SELECT rev FROM revisions WHERE name = ?", (name,)).fetchone()
+                return current, rev[0] if rev else 0
+            return new, self._put_document(conn, name, new)
+        return self._write(body)
+
+    def seed(self, cells: List[Cell], columns: List[str], documents: Dict[str, Dict]) -> bool:
+        def body(conn):
+            if conn.execute("SELECT 1 FROM revisions LIMIT 1").fetchone():
+                return False
+            if cells or columns:
+                self._put_cells(conn, cells, columns)
+            for name, doc in documents.items():
+                self._put_document(conn, name, doc)
+            return True
+        return self._write(body)
+
+    def revisions(self) -> Dict[str, int]:
+        conn = self._conn()
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._local.data_version:
+            return dict(self._local.revisions)
+        revs = dict(conn.execute("SELECT name, rev FROM revisions").fetchall())
+        self._local.data_version, self._local.revisions = version, revs
+        return dict(revs)
+
+
+# =========================================================
+#                 LEGACY FILES (SINGLE PROCESS)
+# =========================================================
+
+class FileBackend(StateBackend):
+    """
+    The original CSV / JSON files, written atomically (temp file + rename).
+    Revisions are per-process counters, bumped by our own writes and
+    whenever a file's modification stamp changes under us (another writer,
+    e.g. lead ingestion). Writes are only serialised within this process.
+    """
+
+    def __init__(self, files: Dict[str, pathlib.Path] = LEGACY_FILES):
+        self.files = files
+        self._lock = threading.RLock()
+        self._stamps: Dict[str, int] = {}
+        self._revs: Dict[str, int] = {name: 0 for name in files}
+
+    def _stamp(self, name: str) -> int:
+        path = self.files[name]
+        return path.stat().st_mtime_ns if path.exists() else 0
+
+    def _sync(self, name: str) -> int:
+        stamp = self._stamp(name)
+        if stamp != self._stamps.get(name, 0):
+            self._stamps[name] = stamp
+            self._revs[name] += 1
+        return self._revs[name]
+
+    def _replace(self, name: str, write: Callable[[pathlib.Path], None]) -> int:
+        path = self.files[name]
+        self._sync(name)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        write(tmp)
+        os.replace(tmp, path)
+        self._stamps[name] = self._stamp(name)
+        self._revs[name] += 1
+        return self._revs[name]
+
+    def read_stats(self) -> pd.DataFrame:
+        path = self.files[STATS]
+        return pd.read_csv(path) if path.exists() else pd.DataFrame(columns=["Date"])
+
+    def write_cells(self, cells: List[Cell], columns: List[str]) -> int:
+        with self._lock:
+            df = self.read_stats()
+            df["Date"] = df["Date"].astype(str)
+            for col in columns:
+                if col not in df.columns:
+                    df[col] = None
+            df = df.set_index("Date")
+            for date, stat, value in cells:
+                if stat not in df.columns:
+                    df[stat] = None
+                try:
+                    df.loc[date, stat] = value
+                except (TypeError, ValueError):
+                    df[stat] = df[stat].astype(object)
+                    df.loc[date, stat] = value
+            df = df.sort_index().reset_index()
+            return self._replace(STATS, lambda p: df.to_csv(p, index=False))
+
+    def read_document(self, name: str) -> Dict:
+        path = self.files[name]
+        if path.exists():
+            try:
+                return json.loads(path.read_text())
+            except Exception:
+                return {}
+        return {}
+
+    def update_document(self, name: str, update: Callable[[Dict], Dict | None]) -> Tuple[Dict, int]:
+        with self._lock:
+            current = self.read_document(name)
+            new = update(current)
+            if new is None:
+                return current, self._sync(name)
+            return new, self._replace(name, lambda p: p.write_text(json.dumps(new, indent=2)))
+
+    def revisions(self) -> Dict[str, int]:
+        with self._lock:
+            return {name: self._sync(name) for name in self.files}
+
+
+# =========================================================
+#               NETWORKED KEY-VALUE BACKEND
+# =========================================================
+
+class MemoryKV:
+    """
+    The subset of the redis-py client KeyValueBackend uses, kept in process
+    memory: a local fake for tests and load tests.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, object] = {}
+        self._mutex = threading.Lock()
+        self._locks: Dict[str, threading.Lock] = {}
+
+    def get(self, key):
+        with self._mutex:
+            return self._data.get(key)
+
+    def mget(self, keys):
+        with self._mutex:
+            return [self._data.get(k) for k in keys]
+
+    def set(self, key, value):
+        with self._mutex:
+            self._data[key] = str(value)
+
+    def incr(self, key):
+        with self._mutex:
+            value = int(self._data.get(key, 0)) + 1
+            self._data[key] = str(value)
+            return value
+
+    def hgetall(self, key):
+        with self._mutex:
+            return dict(self._data.get(key, {}))
+
+    def hset(self, key, mapping):
+        with self._mutex:
+            self._data.setdefault(key, {}).update({f: str(v) for f, v in mapping.items()})
+
+    def hdel(self, key, *fields):
+        with self._mutex:
+            for f in fields:
+                self._data.get(key, {}).pop(f, None)
+
+    def lock(self, name, timeout=None):
+        with self._mutex:
+            return self._locks.setdefault(name, threading.Lock())
+
+
+def _text(value) -> str | None:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class KeyValueBackend(StateBackend):
+    """
+    State in a Redis-style key-value store: cells in one hash
+    ("date|stat" → JSON value), documents as JSON strings, a counter per
+    revision, and writes serialised by the store's lock.
+    """
+
+    PREFIX = "rpl:"
+
+    def __init__(self, client):
+        self.client = client
+
+    def _key(self, *parts: str) -> str:
+        return self.PREFIX + ":".join(parts)
+
+    def read_stats(self) -> pd.DataFrame:
+        columns = json.loads(_text(self.client.get(self._key("columns"))) or "[]")
+        cells = []
+        for field, value in self.client.hgetall(self._key("cells")).items():
+            date, stat = _text(field).split("|", 1)
+            cells.append((date, stat, json.loads(_text(value))))
+        return cells_to_frame(columns, cells)
+
+    def _locked(self):
+        return self.client.lock(self._key("lock"), timeout=30)
+
+    def _put_cells(self, cells: List[Cell], columns: List[str]) -> int:
+        stored = json.loads(_text(self.client.get(self._key("columns"))) or "[]")
+        added = [c for c in dict.fromkeys(columns) if c not in stored]
+        if added:
+            self.client.set(self._key("columns"), json.dumps(stored + added))
+        values = {f"{d}|{s}": json.dumps(v) for d, s, v in cells if v is not None}
+        if values:
+            self.client.hset(self._key("cells"), mapping=values)
+        cleared = [f"{d}|{s}" for d, s, v in cells if v is None]
+        if cleared:
+            self.client.hdel(self._key("cells"), *cleared)
+        return int(self.client.incr(self._key("rev", STATS)))
+
+    def _put_document(self, name: str, body: Dict) -> int:
+        self.client.set(self._key("doc", name), json.dumps(body))
+        return int(self.client.incr(self._key("rev", name)))
+
+    def write_cells(self, cells: List[Cell], columns: List[str]) -> int:
+        with self._locked():
+            return self._put_cells(cells, columns)
+
+    def read_document(self, name: str) -> Dict:
+        body = _text(self.client.get(self._key("doc", name)))
+        return json.loads(body) if body else {}
+
+    def update_document(self, name: str, update: Callable[[Dict], Dict | None]) -> Tuple[Dict, int]:
+        with self._locked():
+            current = self.read_document(name)
+            new = update(current)
+            if new is None:
+                return current, int(_text(self.client.get(self._key("rev", name))) or 0)
+            return new, self._put_document(name, new)
+
+    def seed(self, cells: List[Cell], columns: List[str], documents: Dict[str, Dict]) -> bool:
+        with self._locked():
+            if not self.is_empty():
+                return False
+            if cells or columns:
+                self._put_cells(cells, columns)
+            for name, doc in documents.items():
+                self._put_document(name, doc)
+            return True
+
+    def revisions(self) -> Dict[str, int]:
+        names = (STATS, *DOCUMENTS)
+        values = self.client.mget([self._key("rev", n) for n in names])
+        return {n: int(_text(v) or 0) for n, v in zip(names, values)}
+
+
+# =========================================================
+#                   SELECTION / SEEDING
+# =========================================================
+
+_BACKEND: StateBackend | None = None
+_BACKEND_LOCK = threading.Lock()
+
+
+def seed_from_files(store: StateBackend, files: Dict[str, pathlib.Path] = LEGACY_FILES) -> bool:
+    """Copies the legacy CSV / JSON files into the store if it is still empty."""
+    legacy = FileBackend(files)
+    cells, columns = [], []
+    if files[STATS].exists():
+        df = legacy.read_stats()
+        cells, columns = frame_to_cells(df), [c for c in df.columns if c != "Date"]
+    documents = {name: legacy.read_document(name) for name in DOCUMENTS if files[name].exists()}
+    return store.seed(cells, columns, documents)
+
+
+def make_backend(spec: str) -> StateBackend:
+    """Backend for a RPL_STATE_BACKEND value (see the module docstring)."""
+    if spec == "files":
+        return FileBackend()
+    if spec == "memory":
+        return KeyValueBackend(MemoryKV())
+    if spec.startswith(("redis://", "rediss://")):
+        import redis  # optional: only needed for a Redis deployment
+        return KeyValueBackend(redis.Redis.from_url(spec))
+    if spec == "sqlite":
+        return SQLiteBackend(STATE_DB)
+    raise ValueError(f"Unknown RPL_STATE_BACKEND: {spec!r}")
+
+
+def backend() -> StateBackend:
+    """The process-wide store, created (and seeded if empty) on first use."""
+    global _BACKEND
+    with _BACKEND_LOCK:
+        if _BACKEND is None:
+            store = make_backend(os.environ.get("RPL_STATE_BACKEND", "sqlite"))
+            if store.is_empty():
+                seed_from_files(store)
+            _BACKEND = store
+        return _BACKEND
+
+
+def revision(name: str) -> int:
+    """Current revision of `name` (0 when never written)."""
+    return backend().revisions().get(name, 0)
+
+
+# =========================================================
+#              CROSS-PROCESS CHANGE NOTIFICATION
+# =========================================================
+
+_WATCHERS: List[Callable[[str, int], None]] = []
+_WATCH_THREAD: threading.Thread | None = None
+
+
+def _watch_loop() -> None:
+    try:
+        seen = backend().revisions()
+    except Exception:
+        seen = {}  # unreachable at startup: report every revision once it answers
+    while True:
+        time.sleep(WATCH_SECONDS)
+        try:
+            revs = backend().revisions()
+        except Exception:
+            continue  # store unreachable (e.g. Redis restarting): keep watching
+        for name, rev in revs.items():
+            if seen.get(name) != rev:
+                for callback in list(_WATCHERS):
+                    try:
+                        callback(name, rev)
+                    except Exception:
+                        pass  # a failing watcher must not stop notifications
+        seen = revs
+
+
+def watch(callback: Callable[[str, int], None]) -> None:
+    """
+    Calls callback(name, revision) from a background thread whenever a
+    revision changes, including writes made by other processes.
+    """
+    global _WATCH_THREAD
+    with _BACKEND_LOCK:
+        _WATCHERS.append(callback)
+        if _WATCH_THREAD is None:
+            _WATCH_THREAD = threading.Thread(target=_watch_loop, daemon=True, name="rpl-state-watch")
+            _WATCH_THREAD.start()
@@ -0,0 +1,134 @@
+# rpl_stats/compact_stats.py
+"""
+Opt-in compact representation of the stats frame.
+
+All stat columns live in one contiguous, column-major 2-D float block with a
+column index next to it. Readers get DataFrames built from zero-copy column
+views of the (read-only) block; with pandas Copy-on-Write enabled, anything
+that writes to such a frame copies just the columns it touches.
+"""
+import sys
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .stats_store import canonical_stat_name, to_numeric_stat
+
+
+def enable_copy_on_write() -> None:
+    """Turns on pandas Copy-on-Write (always on from pandas 3)."""
+    if int(pd.__version__.split(".")[0]) < 3:
+        pd.set_option("mode.copy_on_write", True)
+
+
+# =========================================================
+#                       COMPACT FRAME
+# =========================================================
+
+class CompactStats:
+    """Dates + one (rows × stats) float block + column index."""
+
+    def __init__(self, dates: np.ndarray, block: np.ndarray, columns: List[str]):
+        self.dates = dates
+        self.block = block
+        self.columns = list(columns)
+        self.index = {c: j for j, c in enumerate(self.columns)}
+        # Shared with every frame/view handed out → never written in place
+        self.block.flags.writeable = False
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, stat_names: Iterable[str] = (),
+                   dtype=np.float32) -> "CompactStats":
+        """
+        Packs `df` into a single block.
+
+        Columns that only differ from a name in `stat_names` by spacing or
+        dash style are folded into it when that loses nothing (the alias is
+        empty or agrees wherever both have a value).
+        """
+        masters = {canonical_stat_name(c): c for c in stat_names if c in df.columns}
+        values = {}
+        for col in df.columns:
+            if col == "Date":
+                continue
+            v = to_numeric_stat(df[col]).to_numpy()
+            master = masters.get(canonical_stat_name(col))
+            if master is not None and master != col and master in df.columns:
+                base = values.get(master)
+                if base is None:
+                    base = values[master] = to_numeric_stat(df[master]).to_numpy()
+                both = ~np.isnan(base) & ~np.isnan(v)
+                if np.array_equal(base[both], v[both]):
+                    values[master] = np.where(np.isnan(base), v, base)
+                    continue
+            values.setdefault(col, v)
+
+        columns = list(values)
+        block = np.empty((len(df), len(columns)), dtype=dtype, order="F")
+        for j, col in enumerate(columns):
+            block[:, j] = values[col]
+
+        dates = pd.to_datetime(df["Date"]).to_numpy(dtype="datetime64[ns]")
+        return cls(dates, block, columns)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @property
+    def nbytes(self) -> int:
+        return self.block.nbytes + self.dates.nbytes
+
+    def column(self, name: str) -> np.ndarray:
+        """Read-only view of one stat column (no copy)."""
+        return self.block[:, self.index[name]]
+
+    def frame(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """DataFrame of Date + `columns` (all when None) over zero-copy views."""
+        cols = self.columns if columns is None else [c for c in columns if c in self.index]
+        data = {"Date": self.dates}
+        for c in cols:
+            data[c] = self.column(c)
+        return pd.DataFrame(data, copy=False)
+
+
+# =========================================================
+#                   MEMORY BUDGET REPORTING
+# =========================================================
+
+def _deep_sizeof(obj, seen=None) -> int:
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, CompactStats):
+        return obj.nbytes
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True, index=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=True, index=True))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_sizeof(v, seen) for v in obj)
+    return size
+
+
+def memory_report(state: Dict) -> pd.DataFrame:
+    """Bytes held per session-state key, largest first."""
+    rows = []
+    for key in list(state.keys()):
+        try:
+            value = state[key]
+        except KeyError:
+            continue
+        rows.append({"Key": str(key), "Bytes": _deep_sizeof(value)})
+
+    report = pd.DataFrame(rows, columns=["Key", "Bytes"])
+    return report.sort_values("Bytes", ascending=False).reset_index(drop=True)
@@ -0,0 +1,311 @@
+# rpl_stats/conditions.py
+"""
+Weekly conditions: the shared conditions document, Thursday week helpers,
+the auto-classification engine that suggests a condition for every stat in
+every week, the battle-plan completion aggregates behind the performance
+history, and the dense stat × week matrix behind the conditions history.
+
+Suggestions come from one vectorised pass over the (weeks × stats) weekly
+rollup: the 4-week trend slope and week-over-week change are compared with
+per-stat thresholds. Results are cached; when the data changes only the
+weeks whose rollup changed (and the weeks that look back at them) are
+reclassified.
+"""
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .backend import LEGACY_FILES, backend, merge_changes
+from .rollups import resample_df
+
+CONDITIONS_FILE = LEGACY_FILES["conditions"]
+
+CONDITION_LEVELS = ["Non-Existence", "Danger", "Emergency", "Normal", "Affluence", "Power"]
+
+
+# =========================================================
+#                 WEEK HELPERS / STORE
+# =========================================================
+
+def week_date_to_str(d: date) -> str:
+    return d.strftime("%Y-%m-%d")
+
+
+def week_str_to_date(s: str) -> date:
+    return datetime.strptime(s, "%Y-%m-%d").date()
+
+
+def get_latest_completed_week_end() -> date:
+    """Returns most recent Thursday (week end)."""
+    today = datetime.today().date()
+    weekday = today.weekday()
+    days_back = (weekday - 3) % 7  # Thursday = 3
+    return today - timedelta(days=days_back)
+
+
+def load_conditions() -> Dict:
+    """{stat: {week_str: {condition, assigned_to, battle_plan, checks}}}"""
+    return backend().read_document("conditions")
+
+
+def save_conditions(conditions: Dict, base: Dict | None = None) -> Tuple[Dict, int]:
+    """
+    Saves the entries changed since `base` (replaces everything when None),
+    keeping entries other sessions changed meanwhile. Returns (stored
+    conditions, revision).
+    """
+    if base is None:
+        return backend().update_document("conditions", lambda current: conditions)
+    return backend().update_document(
+        "conditions", lambda current: merge_changes(current, base, conditions))
+
+
+def set_battle_plan_check(stat: str, week: str, step: int, checked: bool) -> Tuple[Dict, int]:
+    """
+    Ticks / unticks one battle-plan step in the stored conditions, leaving
+    every other step as stored. Returns (stored conditions, revision); nothing
+    is written when the entry is gone or the step already has that value.
+    """
+    def tick(current: Dict) -> Dict | None:
+        entry = current.get(stat, {}).get(week)
+        if entry is None or step >= len(entry.get("battle_plan", [])):
+            return None
+        checks = entry.setdefault("checks", [])
+        checks.extend([False] * (step + 1 - len(checks)))
+        if checks[step] == checked:
+            return None
+        checks[step] = checked
+        return current
+
+    return backend().update_document("conditions", tick)
+
+
+# =========================================================
+#              CONDITION AUTO-CLASSIFICATION
+# =========================================================
+
+TREND_WEEKS = 4     # slope window
+POWER_WEEKS = 13    # "high range" window for Power
+LOOKBACK = POWER_WEEKS  # furthest any week's suggestion looks back
+
+# Relative weekly change thresholds: ≤ danger → Danger, < normal → Emergency,
+# < affluence → Normal, otherwise Affluence.
+DEFAULT_THRESHOLDS = {"danger": -0.15, "normal": 0.02, "affluence": 0.15}
+
+# Per-stat overrides of DEFAULT_THRESHOLDS
+STAT_THRESHOLDS: Dict[str, Dict[str, float]] = {
+    "Total Adspend": {"danger": -0.30, "affluence": 0.30},
+}
+
+# Stats where going down is the good direction
+LOWER_IS_BETTER = {
+    "Automation Breaks", "Outflow", "Resigns", "CAC",
+    "Leads Delivered (Refunded)", "VLD (Refunded)", "Fallback (Rejected)",
+}
+
+
+def weekly_rollup(df: pd.DataFrame) -> pd.DataFrame:
+    """(Thursday week ends × stats) means, the same rollup the Graphs page uses."""
+    numeric = {"Date": df["Date"]}
+    for col in df.columns:
+        if col != "Date":
+            numeric[col] = pd.to_numeric(df[col], errors="coerce")
+    weekly = resample_df(pd.DataFrame(numeric).dropna(subset=["Date"]), "Weekly")
+    return weekly.set_index("Date")
+
+
+def _shift(a: np.ndarray, n: int) -> np.ndarray:
+    """a shifted down by n rows (NaN-filled)."""
+    out = np.full_like(a, np.nan)
+    if n < len(a):
+        out[n:] = a[:len(a) - n]
+    return out
+
+
+def _classify(values: np.ndarray, columns) -> np.ndarray:
+    """Condition codes (index into CONDITION_LEVELS) for a (weeks × stats) block."""
+    sign = np.array([-1.0 if c in LOWER_IS_BETTER else 1.0 for c in columns])
+    thr = {
+        k: np.array([STAT_THRESHOLDS.get(c, {}).get(k, v) for c in columns])
+        for k, v in DEFAULT_THRESHOLDS.items()
+    }
+
+    y = values
+    prev = _shift(y, 1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Least-squares slope over the last TREND_WEEKS, relative to the window level
+        w = np.arange(TREND_WEEKS) - (TREND_WEEKS - 1) / 2
+        slope = sum(w[j] * _shift(y, TREND_WEEKS - 1 - j) for j in range(TREND_WEEKS))
+        slope = slope / (w ** 2).sum()
+        level = sum(np.abs(_shift(y, j)) for j in range(TREND_WEEKS)) / TREND_WEEKS
+        rel_slope = np.where(level > 0, slope / level, 0.0)
+
+        wow = np.where(np.abs(prev) > 0, (y - prev) / np.abs(prev), np.sign(y - prev))
+
+    # Trend = slope when there is enough history, else week-over-week change
+    trend = np.where(np.isnan(rel_slope), wow, rel_slope) * sign
+    trend = np.nan_to_num(trend, nan=0.0)
+
+    # Power: 3 straight non-declining weeks at ≥ 90% of the 13-week high
+    high = np.fmax.reduce([_shift(y, j) for j in range(POWER_WEEKS)])
+    steady = np.logical_and.reduce([_shift(trend, j) >= thr["normal"] for j in range(3)])
+    power = steady & (y >= 0.9 * high) & (y > 0) & (sign > 0)
+
+    missing = np.isnan(y) | ((y == 0) & (sign > 0))
+
+    return np.select(
+        [missing, power, trend <= thr["danger"], trend < thr["normal"], trend < thr["affluence"]],
+        [0, 5, 1, 2, 3],
+        default=4,
+    ).astype(np.int8)
+
+
+_CACHE: Dict = {}
+_LOCK = threading.Lock()
+
+
+def suggest_conditions(df: pd.DataFrame, data_version: str) -> pd.DataFrame:
+    """
+    Suggested condition codes (index into CONDITION_LEVELS) for every stat
+    (columns) in every Thursday-ending week (index). Cached per data version;
+    on a new version only the changed weeks ± LOOKBACK are reclassified.
+    """
+    with _LOCK:
+        cached = dict(_CACHE)
+    if cached.get("version") == data_version:
+        return cached["codes"]
+
+    weekly = weekly_rollup(df)
+    if weekly.empty:
+        return pd.DataFrame(columns=weekly.columns, dtype=np.int8)
+    hashes = pd.util.hash_pandas_object(weekly, index=True).to_numpy()
+
+    old = cached.get("codes")
+    if old is not None and list(old.columns) == list(weekly.columns):
+        old_hashes = cached["hashes"]
+        n = min(len(old_hashes), len(hashes))
+        same = np.zeros(len(hashes), dtype=bool)
+        same[:n] = old_hashes[:n] == hashes[:n]
+        same[:n] &= old.index[:n] == weekly.index[:n]
+        changed = np.flatnonzero(~same)
+    else:
+        old, changed = None, np.arange(len(hashes))
+
+    if old is not None and not changed.size:
+        codes = old.iloc[:len(hashes)]
+    else:
+        first = int(changed[0]) if changed.size else 0
+        last = min(int(changed[-1]) + LOOKBACK, len(hashes) - 1) if changed.size else -1
+        start = max(first - LOOKBACK, 0)
+
+        block = _classify(weekly.iloc[start:last + 1].to_numpy(dtype=float), weekly.columns)
+        fresh = pd.DataFrame(block[first - start:], index=weekly.index[first:last + 1],
+                             columns=weekly.columns)
+        if old is None:
+            codes = fresh
+        else:
+            parts = [old.iloc[:first], fresh, old.iloc[last + 1:len(hashes)]]
+            codes = pd.concat(parts)
+
+    with _LOCK:
+        _CACHE.update(version=data_version, hashes=hashes, codes=codes)
+    return codes
+
+
+def condition_labels(codes: pd.Series) -> pd.Series:
+    """Maps a row/column of condition codes to CONDITION_LEVELS names."""
+    return pd.Series(np.asarray(CONDITION_LEVELS)[codes.to_numpy()], index=codes.index)
+
+
+# =========================================================
+#          BATTLE-PLAN PERFORMANCE AGGREGATES
+# =========================================================
+
+def build_bp_aggregates(conditions: Dict) -> Dict[str, Dict]:
+    """
+    Completed / total battle-plan steps per (week, person) and per
+    (week, stat), from one scan of the conditions JSON:
+    {"person": {(week, person): [completed, total]}, "stat": {...}}.
+    """
+    aggs: Dict[str, Dict] = {"person": {}, "stat": {}}
+    for stat_name, metric_data in conditions.items():
+        for week, entry in metric_data.items():
+            steps = entry.get("battle_plan", [])
+            if not steps:
+                continue
+            checks = entry.get("checks", [])
+            completed = sum(1 for c in checks[:len(steps)] if c)
+            for kind, key in (("person", entry.get("assigned_to")), ("stat", stat_name)):
+                counts = aggs[kind].setdefault((week, key), [0, 0])
+                counts[0] += completed
+                counts[1] += len(steps)
+    return aggs
+
+
+def update_bp_check(aggs: Dict[str, Dict], week: str, person: str, stat_name: str,
+                    checked: bool) -> None:
+    """Applies one checkbox toggle to the aggregates in O(1)."""
+    delta = 1 if checked else -1
+    for kind, key in (("person", person), ("stat", stat_name)):
+        counts = aggs[kind].get((week, key))
+        if counts is not None:
+            counts[0] += delta
+
+
+def bp_history(aggs: Dict[str, Dict], by: str = "person") -> pd.DataFrame:
+    """Week / Person (or Statistic) / Completed / Total / Performance % rows, oldest week first."""
+    label = "Person" if by == "person" else "Statistic"
+    rows = [
+        {"Week": week, label: key, "Completed": done, "Total": total}
+        for (week, key), (done, total) in aggs[by].items()
+    ]
+    hist = pd.DataFrame(rows, columns=["Week", label, "Completed", "Total"])
+    hist["Performance %"] = (hist["Completed"] / hist["Total"] * 100).round(1)
+    return hist.sort_values(["Week", label]).reset_index(drop=True)
+
+
+# =========================================================
+#              WEEK INDEX / CONDITIONS MATRIX
+# =========================================================
+
+NO_CONDITION = -1
+
+
+class ConditionsMatrix(NamedTuple):
+    """Dense stat × week view of the conditions JSON."""
+    weeks: pd.DatetimeIndex   # sorted week ends with at least one entry
+    stats: List[str]
+    codes: np.ndarray         # (stats × weeks) int8 index into CONDITION_LEVELS, -1 = none
+
+    def week_labels(self) -> List[str]:
+        return list(self.weeks.strftime("%Y-%m-%d"))
+
+
+def build_conditions_matrix(conditions: Dict) -> ConditionsMatrix:
+    """
+    Encodes every recorded condition as an int8 code in one pass over the
+    JSON; week keys are parsed with a single vectorised to_datetime.
+    Unparseable week keys are skipped, unknown condition names map to -1.
+    """
+    level_code = {name: i for i, name in enumerate(CONDITION_LEVELS)}
+    stats = list(conditions)
+
+    rows, keys, codes = [], [], []
+    for r, stat_name in enumerate(stats):
+        for week, entry in conditions[stat_name].items():
+            rows.append(r)
+            keys.append(week)
+            codes.append(level_code.get(entry.get("condition"), NO_CONDITION))
+
+    parsed = pd.to_datetime(pd.Index(keys, dtype=object), format="%Y-%m-%d", errors="coerce")
+    ok = ~parsed.isna()
+    weeks = parsed[ok].unique().sort_values()
+
+    matrix = np.full((len(stats), len(weeks)), NO_CONDITION, dtype=np.int8)
+    matrix[np.asarray(rows, dtype=int)[ok], weeks.get_indexer(parsed[ok])] = \
+        np.asarray(codes, dtype=np.int8)[ok]
+    return ConditionsMatrix(pd.DatetimeIndex(weeks), stats, matrix)
@@ -0,0 +1,124 @@
+# rpl_stats/edits.py
+"""
+Cell-level write-back for the stats data editor.
+
+A content hash per row (pd.util.hash_pandas_object over the input columns,
+i.e. everything apply_formulas doesn't overwrite) is kept alongside the
+canonical frame. An editor delta is applied by hashing only the rows it
+touches with the edits in place: rows whose hash is unchanged (e.g. the
+same delta replayed on a rerun) are dropped, the remaining cells are written
+with positional .iloc writes and formulas are recomputed for those dates
+only. Nothing scales with the table size except copying the columns actually
+written (explicitly, so the caller's frame is never written through whether
+or not pandas Copy-on-Write is on).
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .formulas import FORMULA_COLUMNS, ROW_FORMULA_COLUMNS, apply_formulas_rows
+
+
+def input_columns(df: pd.DataFrame) -> List[str]:
+    """Columns that identify a row's content (no Date, no formula outputs)."""
+    return [c for c in df.columns if c != "Date" and c not in FORMULA_COLUMNS]
+
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """uint64 content hash per row of `df` (positional, index ignored)."""
+    return pd.util.hash_pandas_object(df[input_columns(df)], index=False).to_numpy(copy=True)
+
+
+def _same(old, new) -> np.ndarray:
+    """Elementwise equality of two value arrays, NaN / None equal to each other."""
+    old, new = np.asarray(old, dtype=object), np.asarray(new, dtype=object)
+    return (old == new) | (pd.isna(old) & pd.isna(new))
+
+
+def _set_cells(df: pd.DataFrame, rows: List[int], col: str, values: List) -> None:
+    """Positional write, widening the column to object if the values don't fit."""
+    j = df.columns.get_loc(col)
+    try:
+        df.iloc[rows, j] = values
+    except (TypeError, ValueError):
+        df[col] = df[col].astype(object)
+        df.iloc[rows, j] = values
+
+
+def editor_cells(delta: Dict, columns: List[str]) -> Dict[int, Dict[str, object]]:
+    """
+    {row position: {column: value}} from a st.data_editor state, restricted
+    to `columns`. Deleted rows clear their cells; added rows have no Date
+    and are ignored.
+    """
+    cells: Dict[int, Dict[str, object]] = {}
+    for row, values in (delta.get("edited_rows") or {}).items():
+        kept = {c: v for c, v in values.items() if c in columns}
+        if kept:
+            cells[int(row)] = kept
+    for row in delta.get("deleted_rows") or []:
+        cells[int(row)] = {c: None for c in columns}
+    return cells
+
+
+def apply_cell_edits(df: pd.DataFrame, hashes: np.ndarray,
+                     cells: Dict[int, Dict[str, object]]
+                     ) -> Tuple[pd.DataFrame | None, int, List[int]]:
+    """
+    Writes `cells` ({row position: {column: value}}) into `df` (formula-complete,
+    sorted by Date) and recomputes formulas for the changed rows. Returns
+    (updated frame, cells written, positions of every row that now differs
+    from `df` — the edited rows plus those a running total moved), or
+    (None, 0, []) when no row's content changed. `hashes` is updated in
+    place for the rows written.
+    """
+    inputs = set(input_columns(df))
+    cells = {
+        r: {c: v for c, v in values.items() if c in inputs}
+        for r, values in cells.items() if 0 <= r < len(df)
+    }
+    rows = sorted(r for r, values in cells.items() if values)
+    if not rows:
+        return None, 0, []
+
+    candidate = df.iloc[rows].copy()
+    for col in {c for r in rows for c in cells[r]}:
+        hit = [i for i, r in enumerate(rows) if col in cells[r]]
+        _set_cells(candidate, hit, col, [cells[rows[i]][col] for i in hit])
+
+    new_hashes = row_hashes(candidate)
+    changed = np.flatnonzero(new_hashes != hashes[rows])
+    if not changed.size:
+        return None, 0, []
+
+    changed_rows = [rows[i] for i in changed]
+    # Own copies of the columns written below (edited inputs + formula outputs);
+    # every other column stays shared with `df`
+    updated = df.copy(deep=False)
+    touched = {c for r in changed_rows for c in cells[r]} | set(FORMULA_COLUMNS)
+    for col in [c for c in df.columns if c in touched]:
+        updated[col] = df[col].copy()
+    written = 0
+    for col in {c for r in changed_rows for c in cells[r]}:
+        hit = [i for i in changed if col in cells[rows[i]]]
+        j = candidate.columns.get_loc(col)
+        new = candidate.iloc[hit, j]
+        old = df.iloc[[rows[i] for i in hit], df.columns.get_loc(col)]
+        differs = ~_same(old.to_numpy(), new.to_numpy())
+        if differs.any():
+            hit = [i for i, d in zip(hit, differs) if d]
+            _set_cells(updated, [rows[i] for i in hit], col, new[differs].tolist())
+            written += len(hit)
+
+    updated = apply_formulas_rows(updated, updated["Date"].iloc[changed_rows])
+    hashes[changed_rows] = new_hashes[changed]
+
+    # Running totals move every later row too; only those columns are compared
+    moved = set(changed_rows)
+    first = min(changed_rows)
+    for col in [c for c in FORMULA_COLUMNS if c not in ROW_FORMULA_COLUMNS and c in df.columns]:
+        j = df.columns.get_loc(col)
+        same = _same(df.iloc[first:, j].to_numpy(), updated.iloc[first:, j].to_numpy())
+        moved.update(first + np.flatnonzero(~same))
+    return updated, written, sorted(int(r) for r in moved)
@@ -0,0 +1,239 @@
+# rpl_stats/figures.py
+"""
+Graphs-page figures, built off the Streamlit script thread.
+
+All graphs of a view are prefetched together: the union of their metrics is
+read, filtered and resampled once (window_metrics) and the figures are then
+built concurrently on a shared thread pool. Finished figures are cached per
+(data version, metrics, overlays, colours, date window) for every session,
+and the preset views are pre-warmed in the background whenever a new data
+version appears, so switching views only looks figures up. Callers get
+futures, so a page can draw each figure as soon as it is ready.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple
+
+import pandas as pd
+import plotly.graph_objects as go
+
+from .rollups import (
+    COMPARE_NONE, OVERLAY_RAW, comparison_frame, filter_by_date, overlay_frame, resample_df,
+    window_metrics,
+)
+from .stats_store import canonical_stat_name
+
+MAX_CACHED_FIGURES = 256
+
+_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rpl-figures")
+
+
+class Window(NamedTuple):
+    """Date window a figure is drawn for (sidebar filters)."""
+    range_label: str = "All time"
+    custom_range: tuple | None = None
+    granularity: str = "Daily"
+    compare: str = COMPARE_NONE
+
+
+# =========================================================
+#                     VIEW → GRAPH SPECS
+# =========================================================
+
+def resolve_view_graphs(view_conf: Dict, columns: List[str]) -> List[Dict]:
+    """
+    Graph dicts ({"id", "metrics", "overrides"}) for a saved view, keeping only
+    metrics present in `columns`. Saved names may be aliases that compact
+    storage folded away, so they are matched by canonical name too.
+    """
+    by_canonical = {canonical_stat_name(c): c for c in columns}
+    known = set(columns)
+
+    graphs = []
+    for idx, g in enumerate(view_conf.get("graphs", []), start=1):
+        metrics = [
+            m if m in known else by_canonical[canonical_stat_name(m)]
+            for m in g.get("metrics", [])
+            if m in known or canonical_stat_name(m) in by_canonical
+        ]
+        graphs.append({"id": idx, "metrics": metrics, "overrides": dict(g.get("overrides", {}))})
+    return graphs
+
+
+# =========================================================
+#                       FIGURE BUILDER
+# =========================================================
+
+def build_figure(window_df: pd.DataFrame, full_df: pd.DataFrame, metrics: List[str],
+                 overrides: Dict[str, str], colors: Dict[str, str], window: Window,
+                 data_version: str, compare_df: pd.DataFrame | None = None) -> go.Figure:
+    """
+    One line chart: a trace per metric from `window_df` (already windowed),
+    plus a dashed overlay trace computed on the full daily `full_df` and a
+    dotted comparison-period trace from `compare_df` (already moved onto
+    the window's dates).
+    """
+    fig = go.Figure()
+
+    for metric in metrics:
+        fig.add_trace(
+            go.Scatter(
+                x=window_df["Date"],
+                y=window_df[metric],
+                mode="lines",
+                name=metric,
+                line=dict(color=colors.get(metric)),
+            )
+        )
+
+        if compare_df is not None:
+            fig.add_trace(
+                go.Scatter(
+                    x=compare_df["Date"],
+                    y=compare_df[metric],
+                    mode="lines",
+                    name=f"{metric} · {window.compare.lower()}",
+                    line=dict(color=colors.get(metric), dash="dot"),
+                    opacity=0.6,
+                )
+            )
+
+        overlay = overrides.get(metric, OVERLAY_RAW)
+        if overlay == OVERLAY_RAW:
+            continue
+
+        # Computed on the full daily series, then windowed like the raw trace
+        odf = overlay_frame(full_df, metric, overlay, data_version)
+        odf = filter_by_date(odf, window.range_label, window.custom_range)
+        odf = resample_df(odf, window.granularity)
+
+        fig.add_trace(
+            go.Scatter(
+                x=odf["Date"],
+                y=odf[metric],
+                mode="lines",
+                name=f"{metric} · {overlay}",
+                line=dict(color=colors.get(metric), dash="dash"),
+            )
+        )
+
+    fig.update_layout(
+        height=600,
+        margin=dict(l=40, r=40, t=10, b=40),
+        dragmode="pan",
+        xaxis=dict(type="date", rangeslider=dict(visible=True)),
+        yaxis=dict(title="Value"),
+        legend=dict(orientation="v", xanchor="right", x=1.02, y=0.95),
+        modebar=dict(orientation="h"),
+    )
+    return fig
+
+
+# =========================================================
+#              SHARED FIGURE CACHE + THREAD POOL
+# =========================================================
+
+_CACHE: "OrderedDict[tuple, go.Figure]" = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def figure_cost(graph: Dict) -> int:
+    """Rough build cost: one unit per trace, overlays need a full-history pass."""
+    overrides = graph.get("overrides", {})
+    overlays = sum(1 for m in graph["metrics"] if overrides.get(m, OVERLAY_RAW) != OVERLAY_RAW)
+    return len(graph["metrics"]) + 3 * overlays
+
+
+def figure_key(graph: Dict, colors: Dict[str, str], window: Window, data_version: str) -> tuple:
+    metrics = tuple(graph["metrics"])
+    overlays = tuple(graph.get("overrides", {}).get(m, OVERLAY_RAW) for m in metrics)
+    return data_version, window, metrics, overlays, tuple(colors.get(m) for m in metrics)
+
+
+def _store(key: tuple, fig: go.Figure) -> None:
+    with _LOCK:
+        _CACHE[key] = fig
+        _CACHE.move_to_end(key)
+        while len(_CACHE) > MAX_CACHED_FIGURES:
+            _CACHE.popitem(last=False)
+
+
+def _cache_when_done(key: tuple):
+    def callback(future: Future) -> None:
+        if future.exception() is None:
+            _store(key, future.result())
+    return callback
+
+
+def _done(fig: go.Figure) -> Future:
+    future: Future = Future()
+    future.set_result(fig)
+    return future
+
+
+def figure_futures(graphs: List[Dict], full_df: pd.DataFrame, colors: Dict[str, str],
+                   window: Window, data_version: str) -> Dict[int, Future]:
+    """
+    {graph index: Future[go.Figure]} for every graph with metrics. Cached
+    figures come back already resolved; the rest share one columnar read of
+    their metrics and are queued on the thread pool cheapest first, so the
+    first figures are ready after one small build however many there are.
+    """
+    futures: Dict[int, Future] = {}
+    missing = []
+    for i, graph in enumerate(graphs):
+        if not graph["metrics"]:
+            continue
+        key = figure_key(graph, colors, window, data_version)
+        with _LOCK:
+            fig = _CACHE.get(key)
+        if fig is not None:
+            futures[i] = _done(fig)
+        else:
+            missing.append((i, graph, key))
+
+    if missing:
+        union = [m for _, graph, _ in missing for m in graph["metrics"]]
+        bounds = (window.range_label, window.custom_range)
+        window_df = window_metrics(full_df, union, *bounds, window.granularity)
+        compare_df = comparison_frame(full_df, union, *bounds, window.granularity, window.compare)
+
+        for i, graph, key in sorted(missing, key=lambda job: figure_cost(job[1])):
+            future = _POOL.submit(
+                build_figure, window_df, full_df, graph["metrics"],
+                graph.get("overrides", {}), colors, window, data_version, compare_df,
+            )
+            future.add_done_callback(_cache_when_done(key))
+            futures[i] = future
+
+    return futures
+
+
+# =========================================================
+#                    PRESET VIEW PRE-WARM
+# =========================================================
+
+_WARMED: Dict[str, str] = {}
+
+
+def prewarm_views(views: Dict[str, Dict], names: Iterable[str], full_df: pd.DataFrame,
+                  colors: Dict[str, str], data_version: str) -> None:
+    """
+    Builds the figures of the named saved views for the default window in
+    the background, once per data version (a no-op when already warmed).
+    """
+    with _LOCK:
+        if _WARMED.get("version") == data_version:
+            return
+        _WARMED["version"] = data_version
+
+    columns = [c for c in full_df.columns if c != "Date"]
+
+    def warm():
+        for name in names:
+            if name in views:
+                graphs = resolve_view_graphs(views[name], columns)
+                figure_futures(graphs, full_df, colors, Window(), data_version)
+
+    threading.Thread(target=warm, daemon=True, name="rpl-prewarm").start()
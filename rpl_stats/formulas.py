@@ -0,0 +1,147 @@
+# rpl_stats/formulas.py
+"""
+Derived-column formulas for the stats table.
+
+`apply_formulas` recomputes the whole frame; `apply_formulas_rows` only
+recomputes the given dates (plus the running "Total # of Identities" from
+the first of them onwards) for jobs that touch a handful of days.
+"""
+from typing import Iterable
+
+import pandas as pd
+
+
+# Columns written by _apply_row_formulas (each depends only on its own row)
+ROW_FORMULA_COLUMNS = [
+    "Software Development Expansion Index",
+    "Total Adspend",
+    "Total Leads",
+    "Sellable Leads",
+    "Leads Delivered (Corrected)",
+    "VLD (Corrected)",
+    "Churn %",
+    "Total Profit",
+    "Profit Margin %",
+]
+
+# Every column apply_formulas writes (inputs to it are all the others)
+FORMULA_COLUMNS = ROW_FORMULA_COLUMNS + ["Total # of Identities"]
+
+
+def _apply_row_formulas(df: pd.DataFrame) -> pd.DataFrame:
+    """Row-wise formulas (everything except running totals)."""
+
+    def g(col):
+        return pd.to_numeric(df.get(col, 0), errors="coerce").fillna(0)
+
+    # Software Development Expansion Index
+    df["Software Development Expansion Index"] = (
+        g("Weighted Digital Assets")
+        + g("Innovation Counts")
+        - g("Automation Breaks")
+    )
+
+    # TOTAL AD SPEND
+    df["Total Adspend"] = (
+        g("Google – Simple Close – Adspend")
+        + g("FB – Simple Close – Adspend")
+        + g("FB – True Blue Homes – Adspend")
+        + g("Leadzolo Supplement")
+        + g("Property Leads Supplement")
+    )
+
+    # TOTAL LEADS
+    df["Total Leads"] = (
+        g("Fallback (Listed)")
+        + g("Fallback (Unsold)")
+        + g("Fallback (Rejected)")
+        + g("Leads Delivered (Provisional)")
+    )
+
+    # SELLABLE LEADS
+    df["Sellable Leads"] = (
+        g("Fallback (Unsold)")
+        + g("Fallback (Rejected)")
+        + g("Leads Delivered (Provisional)")
+    )
+
+    # LEADS DELIVERED CORRECTED
+    df["Leads Delivered (Corrected)"] = (
+        g("Leads Delivered (Provisional)")
+        - g("Leads Delivered (Refunded)")
+    )
+
+    # VLD CORRECTED
+    df["VLD (Corrected)"] = (
+        g("VLD (Provisional)") - g("VLD (Refunded)")
+    )
+
+    # CHURN %
+    finished = g("Finished Packages")
+    resigns = g("Resigns")
+    df["Churn %"] = None
+    valid = finished > 0
+    df.loc[valid, "Churn %"] = ((finished - resigns) / finished) * 100
+
+    # TOTAL PROFIT
+    df["Total Profit"] = (
+        g("VLD (Corrected)") - g("Total Adspend")
+    )
+
+    # PROFIT MARGIN %
+    df["Profit Margin %"] = None
+    vld = g("VLD (Corrected)")
+    profit = df["Total Profit"]
+    mask = vld != 0
+    df.loc[mask, "Profit Margin %"] = (profit[mask] / vld[mask]) * 100
+
+    return df
+
+
+def apply_formulas(df: pd.DataFrame) -> pd.DataFrame:
+    """Applies all derived-column formulas safely."""
+    df = _apply_row_formulas(df)
+
+    # TOTAL # OF IDENTITIES — cumulative
+    df = df.sort_values("Date")
+    if "New Identities To CRM" in df.columns:
+        new = pd.to_numeric(df["New Identities To CRM"], errors="coerce").fillna(0)
+        df["Total # of Identities"] = new.cumsum()
+    else:
+        df["Total # of Identities"] = None
+
+    return df
+
+
+def apply_formulas_rows(df: pd.DataFrame, dates: Iterable) -> pd.DataFrame:
+    """
+    Recomputes formulas for `dates` only. `df` must already be formula-complete
+    everywhere else; the running identities total is carried on from the row
+    before the first changed date instead of re-summing the whole history.
+    """
+    if not df["Date"].is_monotonic_increasing:
+        df = df.sort_values("Date")
+
+    mask = df["Date"].isin(pd.to_datetime(list(dates))).to_numpy()
+    if not mask.any():
+        return df
+
+    sub = _apply_row_formulas(df.loc[mask].copy())
+    for col in ROW_FORMULA_COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+        if df[col].dtype != sub[col].dtype:
+            df[col] = df[col].astype(object)
+        df.loc[mask, col] = sub[col].to_numpy()
+
+    if "New Identities To CRM" in df.columns:
+        first = int(mask.argmax())
+        before = 0.0
+        if first > 0:
+            prev = df["Total # of Identities"].iloc[first - 1:first]
+            before = pd.to_numeric(prev, errors="coerce").fillna(0).iloc[0]
+        new = pd.to_numeric(df["New Identities To CRM"].iloc[first:], errors="coerce").fillna(0)
+        col = df.columns.get_loc("Total # of Identities")
+        df.iloc[first:, col] = (before + new.cumsum()).to_numpy()
+
+    return df
@@ -0,0 +1,351 @@
+# rpl_stats/rollups.py
+"""
+Date-range filtering, weekly resampling and rolling-window overlays for the
+Graphs page.
+
+Every overlay is computed on the date-sorted daily series with prefix-sum
+kernels, so a 7- or 28-day window costs O(n) no matter how wide it is.
+Results are cached per (metric, overlay, data version); when a newer data
+version only differs in the tail of a series, the cached prefix sums are
+reused and only the changed tail is recomputed.
+
+Period-over-period comparison reads window totals and means from per-stat
+prefix sums (kept up to date the same way), so any window costs two
+lookups however long it is.
+"""
+import threading
+from datetime import timedelta
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# =========================================================
+#               DATE FILTERING / RESAMPLING
+# =========================================================
+
+def window_bounds(last_date, range_label: str, custom_range) -> Tuple[pd.Timestamp, pd.Timestamp] | None:
+    """(start, end) of a preset or custom range ending at `last_date`; None = unbounded."""
+    end = pd.Timestamp(last_date)
+
+    if range_label == "Last 7 days":
+        start = end - timedelta(days=7)
+    elif range_label == "Last 30 days":
+        start = end - timedelta(days=30)
+    elif range_label == "Last 90 days":
+        start = end - timedelta(days=90)
+    elif range_label == "Custom" and custom_range and len(custom_range) == 2:
+        start, end = custom_range
+        start = pd.to_datetime(start)
+        end = pd.to_datetime(end)
+    else:
+        return None
+
+    return start, end
+
+
+def filter_by_date(df: pd.DataFrame, range_label: str, custom_range):
+    """Filters by preset or custom date range."""
+    if df.empty or "Date" not in df.columns:
+        return df
+
+    df = df.sort_values("Date")
+    bounds = window_bounds(df["Date"].max(), range_label, custom_range)
+    if bounds is None:
+        return df
+
+    start, end = bounds
+    return df[(df["Date"] >= start) & (df["Date"] <= end)]
+
+
+def resample_df(df: pd.DataFrame, granularity: str):
+    """Resamples dataframe into daily or weekly data."""
+    if granularity == "Daily":
+        return df
+
+    if granularity == "Weekly":
+        df = df.set_index("Date")
+        weekly = df.resample("W-THU").mean(numeric_only=True)
+        weekly["Date"] = weekly.index
+        return weekly.reset_index(drop=True)
+
+    return df
+
+
+def window_metrics(df: pd.DataFrame, metrics, range_label: str, custom_range,
+                   granularity: str) -> pd.DataFrame:
+    """
+    Date + `metrics` of `df`, date-filtered, made numeric and resampled.
+    Only the requested columns are touched, so the cost follows the number
+    of metrics shown rather than the width of the stats table.
+    """
+    cols = [m for m in dict.fromkeys(metrics) if m in df.columns and m != "Date"]
+    df = df[["Date"] + cols].dropna(subset=["Date"])
+    df = filter_by_date(df, range_label, custom_range)
+    for col in cols:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    return resample_df(df, granularity)
+
+
+# =========================================================
+#                     OVERLAY DEFINITIONS
+# =========================================================
+
+OVERLAY_RAW = "Raw"
+
+# label → (kernel, window in days)
+OVERLAYS: Dict[str, Tuple[str, int]] = {
+    "7-day moving average": ("mean", 7),
+    "28-day moving average": ("mean", 28),
+    "7-day rolling sum": ("sum", 7),
+    "28-day rolling sum": ("sum", 28),
+    "Week-over-week delta": ("delta", 7),
+    "Year-over-year": ("lag", 364),  # same weekday last year
+}
+
+OVERLAY_OPTIONS = [OVERLAY_RAW] + list(OVERLAYS)
+
+
+# =========================================================
+#                    O(n) STREAMING KERNELS
+# =========================================================
+
+def _prefix_sums(values: np.ndarray, start: int, csum: np.ndarray, ccount: np.ndarray):
+    """Fills csum/ccount (length n + 1) from position `start` onwards."""
+    tail = values[start:]
+    valid = ~np.isnan(tail)
+    csum[start + 1:] = csum[start] + np.cumsum(np.where(valid, tail, 0.0))
+    ccount[start + 1:] = ccount[start] + np.cumsum(valid)
+
+
+def _run_kernel(kind: str, window: int, values: np.ndarray,
+                csum: np.ndarray, ccount: np.ndarray, start: int) -> np.ndarray:
+    """Evaluates the kernel for positions start..n-1."""
+    n = len(values)
+    idx = np.arange(start, n)
+
+    if kind in ("sum", "mean"):
+        lo = np.maximum(idx + 1 - window, 0)
+        total = csum[idx + 1] - csum[lo]
+        count = ccount[idx + 1] - ccount[lo]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out = total / count if kind == "mean" else total
+        return np.where(count > 0, out, np.nan)
+
+    prev = np.full(len(idx), np.nan)
+    has_prev = idx >= window
+    prev[has_prev] = values[idx[has_prev] - window]
+
+    if kind == "delta":
+        return values[start:] - prev
+    return prev  # "lag"
+
+
+# =========================================================
+#              CACHE WITH INCREMENTAL TAIL EXTENSION
+# =========================================================
+
+class _Entry:
+    __slots__ = ("version", "dates", "values", "csum", "ccount", "result")
+
+
+_CACHE: Dict[Tuple[str, str, int], _Entry] = {}
+_LOCK = threading.Lock()
+
+
+def _first_change(entry: _Entry, dates: np.ndarray, values: np.ndarray) -> int:
+    """Index of the first position where the new series differs from the cached one."""
+    m = min(len(entry.values), len(values))
+    same = (entry.dates[:m] == dates[:m]) & (
+        (entry.values[:m] == values[:m])
+        | (np.isnan(entry.values[:m]) & np.isnan(values[:m]))
+    )
+    diff = np.flatnonzero(~same)
+    return int(diff[0]) if diff.size else m
+
+
+def _compute(metric: str, kind: str, window: int, version: str,
+             dates: np.ndarray, values: np.ndarray) -> np.ndarray:
+    key = (metric, kind, window)
+    n = len(values)
+
+    with _LOCK:
+        entry = _CACHE.get(key)
+        if entry is not None and entry.version == version:
+            return entry.result
+
+    start = 0
+    csum = np.zeros(n + 1)
+    ccount = np.zeros(n + 1, dtype=np.int64)
+    result = np.empty(n)
+
+    if entry is not None:
+        start = _first_change(entry, dates, values)
+        csum[:start + 1] = entry.csum[:start + 1]
+        ccount[:start + 1] = entry.ccount[:start + 1]
+        result[:start] = entry.result[:start]
+
+    if kind in ("sum", "mean"):
+        _prefix_sums(values, start, csum, ccount)
+    result[start:] = _run_kernel(kind, window, values, csum, ccount, start)
+
+    new = _Entry()
+    new.version, new.dates, new.values = version, dates, values
+    new.csum, new.ccount, new.result = csum, ccount, result
+    with _LOCK:
+        _CACHE[key] = new
+    return result
+
+
+def overlay_frame(df: pd.DataFrame, metric: str, overlay: str, data_version: str) -> pd.DataFrame:
+    """
+    Returns a Date + metric frame holding the overlay for `metric`.
+
+    `df` must be the full daily stats frame (not date-filtered), so windows
+    at the start of the visible range still see their history.
+    """
+    kind, window = OVERLAYS[overlay]
+
+    dates, values = _daily_series(df, metric)
+    result = _compute(metric, kind, window, data_version, dates, values)
+    return pd.DataFrame({"Date": dates, metric: result})
+
+
+# =========================================================
+#           RANGE AGGREGATES (PER-STAT PREFIX SUMS)
+# =========================================================
+
+class _Prefix:
+    __slots__ = ("version", "dates", "values", "csum", "ccount")
+
+
+_PREFIX: Dict[str, _Prefix] = {}
+
+
+def _daily_series(df: pd.DataFrame, metric: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(dates, float values) of `metric`, sorted by Date."""
+    daily = df[["Date", metric]].dropna(subset=["Date"]).sort_values("Date")
+    dates = daily["Date"].to_numpy(dtype="datetime64[ns]")
+    return dates, pd.to_numeric(daily[metric], errors="coerce").to_numpy(dtype=float)
+
+
+def _prefix(df: pd.DataFrame, metric: str, version: str) -> _Prefix:
+    """
+    Prefix sums / counts of one stat for `version`. A new version reuses the
+    cached sums up to the first changed day and only recomputes from there,
+    so editing recent days doesn't re-sum the whole history.
+    """
+    with _LOCK:
+        entry = _PREFIX.get(metric)
+        if entry is not None and entry.version == version:
+            return entry
+
+    dates, values = _daily_series(df, metric)
+    csum = np.zeros(len(values) + 1)
+    ccount = np.zeros(len(values) + 1, dtype=np.int64)
+
+    start = 0
+    if entry is not None:
+        start = _first_change(entry, dates, values)
+        csum[:start + 1] = entry.csum[:start + 1]
+        ccount[:start + 1] = entry.ccount[:start + 1]
+    _prefix_sums(values, start, csum, ccount)
+
+    new = _Prefix()
+    new.version, new.dates, new.values = version, dates, values
+    new.csum, new.ccount = csum, ccount
+    with _LOCK:
+        _PREFIX[metric] = new
+    return new
+
+
+def range_aggregate(df: pd.DataFrame, metric: str, start, end, data_version: str) -> Tuple[float, float, int]:
+    """
+    (total, mean, days with a value) of `metric` between `start` and `end`
+    (inclusive) — two lookups in the cached prefix sums, whatever the
+    window length.
+    """
+    p = _prefix(df, metric, data_version)
+    lo = int(np.searchsorted(p.dates, np.datetime64(pd.Timestamp(start)), side="left"))
+    hi = int(np.searchsorted(p.dates, np.datetime64(pd.Timestamp(end)), side="right"))
+    if hi <= lo:
+        return np.nan, np.nan, 0
+    total = p.csum[hi] - p.csum[lo]
+    count = int(p.ccount[hi] - p.ccount[lo])
+    if count == 0:
+        return np.nan, np.nan, 0
+    return total, total / count, count
+
+
+# =========================================================
+#                 PERIOD-OVER-PERIOD COMPARISON
+# =========================================================
+
+COMPARE_NONE = "Nothing"
+
+# label → shift in days (None = the window's own length)
+COMPARE_MODES: Dict[str, int | None] = {
+    "Previous period": None,
+    "Same period last year": 364,  # same weekday last year
+}
+
+COMPARE_OPTIONS = [COMPARE_NONE] + list(COMPARE_MODES)
+
+
+def compare_windows(df: pd.DataFrame, range_label: str, custom_range, mode: str):
+    """
+    ((start, end), (prev_start, prev_end), shift) for a comparison, or None
+    when comparing is off or the range is unbounded ("All time").
+    """
+    if mode not in COMPARE_MODES or df.empty:
+        return None
+    bounds = window_bounds(df["Date"].max(), range_label, custom_range)
+    if bounds is None:
+        return None
+
+    start, end = bounds
+    days = COMPARE_MODES[mode]
+    shift = pd.Timedelta(days=days) if days is not None else (end - start) + pd.Timedelta(days=1)
+    return (start, end), (start - shift, end - shift), shift
+
+
+def comparison_frame(df: pd.DataFrame, metrics, range_label: str, custom_range,
+                     granularity: str, mode: str) -> pd.DataFrame | None:
+    """
+    The comparison period's Date + `metrics`, resampled like the current
+    window and moved forward onto its dates so both share one x-axis.
+    """
+    windows = compare_windows(df, range_label, custom_range, mode)
+    if windows is None:
+        return None
+    _, previous, shift = windows
+    frame = window_metrics(df, metrics, "Custom", previous, granularity)
+    frame["Date"] = frame["Date"] + shift
+    return frame
+
+
+def comparison_summary(df: pd.DataFrame, metrics, range_label: str, custom_range,
+                       mode: str, data_version: str) -> pd.DataFrame:
+    """Totals, means and % change per metric, current window vs comparison period."""
+    windows = compare_windows(df, range_label, custom_range, mode)
+    if windows is None:
+        return pd.DataFrame()
+    current, previous, _ = windows
+
+    rows = []
+    for metric in dict.fromkeys(metrics):
+        total, mean, _ = range_aggregate(df, metric, *current, data_version)
+        prev_total, prev_mean, _ = range_aggregate(df, metric, *previous, data_version)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rows.append({
+                "Statistic": metric,
+                "Total": total,
+                "Previous total": prev_total,
+                "Total change %": 100 * (total - prev_total) / abs(prev_total),
+                "Mean": mean,
+                "Previous mean": prev_mean,
+                "Mean change %": 100 * (mean - prev_mean) / abs(prev_mean),
+            })
+    summary = pd.DataFrame(rows).replace([np.inf, -np.inf], np.nan)
+    return summary.round(2)
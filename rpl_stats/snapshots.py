@@ -0,0 +1,326 @@
+# rpl_stats/snapshots.py
+"""
+Point-in-time history of the stats table, for "as of" views.
+
+Every save_data call that changes a value records a version in
+stats_history/:
+
+    versions.csv                  seq, saved_at, kind, cells
+    checkpoint-000001.json.gz     columns + every input cell (every CHECKPOINT_EVERY versions)
+    delta-000002.json             columns + the cells that save wrote: [Date, Statistic, Value]
+
+Only input columns are kept (formula columns are recomputed on the way out).
+Values are kept exactly as the state store holds them (numbers as numbers,
+text such as "$60.57" as text), so a version reads back through the same
+cells_to_frame / apply_formulas path as the live table. A version is rebuilt
+from the nearest checkpoint at or before it plus at most CHECKPOINT_EVERY - 1
+deltas, so reconstruction cost doesn't grow with the history. Rebuilt
+snapshots are cached per process; recording holds an exclusive lock on
+stats_history/.lock, so worker processes saving at the same time get
+distinct version numbers.
+
+save_data writes and records under that lock, passing the cells it wrote,
+so a delta costs what the save did; when the history is still empty it first
+records the table as it was stored, so the state before versioning started
+stays reachable. The history itself stays on local disk.
+"""
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process deployments only
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+from .backend import Cell, cells_to_frame, frame_to_cells
+from .formulas import FORMULA_COLUMNS, apply_formulas
+from .stats_store import BASE_DIR, MASTER_STATS
+
+HISTORY_DIR = BASE_DIR / "stats_history"
+VERSIONS_FILE = HISTORY_DIR / "versions.csv"
+LOCK_FILE = HISTORY_DIR / ".lock"
+
+CHECKPOINT_EVERY = 20
+MAX_CACHED_SNAPSHOTS = 8
+
+VERSION_COLUMNS = ["seq", "saved_at", "kind", "cells"]
+
+# (stat columns in order, {(date, stat): value})
+State = Tuple[List[str], Dict[Tuple[str, str], object]]
+
+
+# =========================================================
+#                      VERSION INDEX
+# =========================================================
+
+def list_versions() -> pd.DataFrame:
+    """The version index, oldest first (empty when nothing is recorded)."""
+    if VERSIONS_FILE.exists():
+        try:
+            return pd.read_csv(VERSIONS_FILE, parse_dates=["saved_at"])
+        except pd.errors.EmptyDataError:
+            pass  # just created by the first append, header not written yet
+    return pd.DataFrame({
+        "seq": pd.Series(dtype="int64"), "saved_at": pd.Series(dtype="datetime64[ns]"),
+        "kind": pd.Series(dtype=object), "cells": pd.Series(dtype="int64"),
+    })
+
+
+def version_at(as_of, versions: pd.DataFrame | None = None) -> int | None:
+    """Seq of the last version saved at or before `as_of` (None if none)."""
+    versions = list_versions() if versions is None else versions
+    saved = versions[versions["saved_at"] <= pd.Timestamp(as_of)]
+    return None if saved.empty else int(saved["seq"].iloc[-1])
+
+
+def version_labels(versions: pd.DataFrame | None = None) -> Dict[int, str]:
+    """{seq: "#seq · saved at"}, newest first (saves in one second stay apart)."""
+    versions = list_versions() if versions is None else versions
+    return {
+        int(seq): f"#{seq} · {saved_at:%Y-%m-%d %H:%M:%S}"
+        for seq, saved_at in zip(versions["seq"][::-1], versions["saved_at"][::-1])
+    }
+
+
+def _checkpoint_file(seq: int):
+    return HISTORY_DIR / f"checkpoint-{seq:06d}.json.gz"
+
+
+def _delta_file(seq: int):
+    return HISTORY_DIR / f"delta-{seq:06d}.json"
+
+
+# =========================================================
+#                  INPUT CELLS / STATE FILES
+# =========================================================
+
+def _inputs(cells: List[Cell]) -> List[Cell]:
+    """`cells` without formula columns (those are recomputed when read)."""
+    return [c for c in cells if c[1] not in FORMULA_COLUMNS]
+
+
+def _input_columns(columns) -> List[str]:
+    return [c for c in columns if c != "Date" and c not in FORMULA_COLUMNS]
+
+
+def _legacy_cells(path) -> List[Cell]:
+    """Cells of a numeric checkpoint / delta CSV written before raw values were kept."""
+    df = pd.read_csv(path)
+    if "Statistic" in df.columns:
+        df = df.astype({"Value": object}).where(df.notna(), None)
+        return [(str(d), str(s), v) for d, s, v in df[["Date", "Statistic", "Value"]].itertuples(index=False)]
+    return frame_to_cells(df)
+
+
+def _read_checkpoint(seq: int) -> State:
+    path = _checkpoint_file(seq)
+    if not path.exists():
+        cells = _legacy_cells(path.with_name(f"checkpoint-{seq:06d}.csv.gz"))
+        return list(dict.fromkeys(s for _, s, _ in cells)), {(d, s): v for d, s, v in cells}
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        body = json.load(fh)
+    return body["columns"], {(d, s): v for d, s, v in body["cells"]}
+
+
+def _write_checkpoint(seq: int, state: State) -> None:
+    columns, values = state
+    body = {"columns": columns, "cells": [[d, s, v] for (d, s), v in values.items()]}
+    with gzip.open(_checkpoint_file(seq), "wt", encoding="utf-8") as fh:
+        json.dump(body, fh)
+
+
+def _read_delta(seq: int) -> Tuple[List[str], List[Cell]]:
+    path = _delta_file(seq)
+    if not path.exists():
+        return [], _legacy_cells(path.with_suffix(".csv"))
+    body = json.loads(path.read_text())
+    return body["columns"], [tuple(c) for c in body["cells"]]
+
+
+def _replay(state: State, cells: List[Cell], columns: List[str] = ()) -> State:
+    """
+    A new state: `state` with `columns` added where missing and `cells` (in
+    order) applied; None clears a cell.
+    """
+    out, values = list(state[0]), dict(state[1])
+    known = set(out)
+    for stat in [*columns, *(s for _, s, _ in cells)]:
+        if stat not in known:
+            out.append(stat)
+            known.add(stat)
+    for date, stat, value in cells:
+        if value is None:
+            values.pop((date, stat), None)
+        else:
+            values[(date, stat)] = value
+    return out, values
+
+
+# =========================================================
+#                     RECONSTRUCTION
+# =========================================================
+
+_LOCK = threading.RLock()
+_RAW: "OrderedDict[int, State]" = OrderedDict()
+
+
+def _raw(seq: int, versions: pd.DataFrame) -> State:
+    """Input cells of version `seq`: nearest checkpoint + delta replay."""
+    with _LOCK:
+        if seq in _RAW:
+            _RAW.move_to_end(seq)
+            return _RAW[seq]
+
+    upto = versions[versions["seq"] <= seq]
+    start = int(upto.loc[upto["kind"] == "checkpoint", "seq"].iloc[-1])
+    columns, cells = [], []
+    for s in upto.loc[upto["seq"] > start, "seq"]:
+        delta_columns, delta_cells = _read_delta(int(s))
+        columns += delta_columns
+        cells += delta_cells
+    raw = _replay(_read_checkpoint(start), cells, columns)
+    _remember(seq, raw)
+    return raw
+
+
+def _remember(seq: int, raw: State) -> None:
+    with _LOCK:
+        _RAW[seq] = raw
+        _RAW.move_to_end(seq)
+        while len(_RAW) > MAX_CACHED_SNAPSHOTS:
+            _RAW.popitem(last=False)
+
+
+def stats_version(seq: int, versions: pd.DataFrame | None = None) -> Tuple[pd.DataFrame, str] | None:
+    """
+    (formula-complete stats frame, cache version key) of version `seq`, or
+    None when there is no such version. Daily rows run up to its save date.
+    """
+    versions = list_versions() if versions is None else versions
+    row = versions[versions["seq"] == seq]
+    if row.empty:
+        return None
+    saved_at = row["saved_at"].iloc[0]
+
+    columns, values = _raw(seq, versions)
+    raw = cells_to_frame(columns, [(d, s, v) for (d, s), v in values.items()])
+    raw = raw.set_index(pd.DatetimeIndex(pd.to_datetime(raw["Date"]), name="Date")).drop(columns="Date")
+    end = max(raw.index.max(), saved_at.normalize()) if not raw.empty else saved_at.normalize()
+    start = raw.index.min() if not raw.empty else end
+    df = raw.reindex(pd.date_range(start, end, freq="D", name="Date")).reset_index()
+    for col in MASTER_STATS:
+        if col not in df.columns:
+            df[col] = np.nan
+    return apply_formulas(df), f"snapshot-{seq}-{saved_at:%Y%m%d%H%M%S}"
+
+
+def stats_as_of(as_of) -> Tuple[pd.DataFrame, str] | None:
+    """stats_version of the last version saved at or before `as_of` (None if none)."""
+    versions = list_versions()
+    seq = version_at(as_of, versions)
+    return None if seq is None else stats_version(seq, versions)
+
+
+# =========================================================
+#                       RECORDING
+# =========================================================
+
+_HELD = threading.local()
+
+
+@contextmanager
+def _history_lock():
+    """
+    This process's lock plus an exclusive flock shared with other processes
+    (re-entrant within a thread).
+    """
+    with _LOCK:
+        if getattr(_HELD, "depth", 0):
+            _HELD.depth += 1
+            try:
+                yield
+            finally:
+                _HELD.depth -= 1
+            return
+
+        HISTORY_DIR.mkdir(exist_ok=True)
+        with open(LOCK_FILE, "a") as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            _HELD.depth = 1
+            try:
+                yield
+            finally:
+                _HELD.depth = 0
+                if fcntl is not None:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _append_version(seq: int, saved_at: pd.Timestamp, kind: str, cells: int) -> None:
+    row = pd.DataFrame([[seq, saved_at.strftime("%Y-%m-%d %H:%M:%S"), kind, cells]],
+                       columns=VERSION_COLUMNS)
+    row.to_csv(VERSIONS_FILE, mode="a", header=not VERSIONS_FILE.exists(), index=False)
+
+
+def record_version(cells: List[Cell], columns: List[str] = (), saved_at=None) -> int | None:
+    """
+    Records the cells a save wrote (as stored; None = cleared) and the stat
+    `columns` of the saved table as a new version. Returns the new seq, or
+    None when no input cell was written. Deltas cost O(cells + columns);
+    every CHECKPOINT_EVERY-th version writes the full state instead.
+    """
+    saved_at = pd.Timestamp.now().floor("s") if saved_at is None else pd.Timestamp(saved_at)
+    cells, columns = _inputs(cells), _input_columns(columns)
+    if not cells:
+        return None
+
+    with _history_lock():
+        versions = list_versions()
+        if versions.empty:
+            seq, kind = 1, "checkpoint"
+        else:
+            head = int(versions["seq"].iloc[-1])
+            seq = head + 1
+            since = head - int(versions.loc[versions["kind"] == "checkpoint", "seq"].iloc[-1])
+            kind = "checkpoint" if since + 1 >= CHECKPOINT_EVERY else "delta"
+
+        if kind == "checkpoint":
+            state = _replay(_raw(seq - 1, versions) if seq > 1 else ([], {}), cells, columns)
+            _write_checkpoint(seq, state)
+            _remember(seq, state)
+        else:
+            body = {"columns": columns, "cells": [list(c) for c in cells]}
+            _delta_file(seq).write_text(json.dumps(body))
+        _append_version(seq, saved_at, kind, len(cells))
+    return seq
+
+
+def record_baseline(read_table: Callable[[], pd.DataFrame], saved_at) -> int | None:
+    """
+    Records every cell of read_table() as the first version when nothing is
+    recorded yet (checked under the history lock, so only one process does it).
+    """
+    with _history_lock():
+        if VERSIONS_FILE.exists():
+            return None
+        table = read_table()
+        return record_version(frame_to_cells(table), list(table.columns), saved_at)
+
+
+def record_write(write: Callable[[], int], cells: List[Cell], columns: List[str]) -> int:
+    """
+    Runs write() — storing `cells` into a table with stat `columns` — and
+    records them, both under the history lock, so versions follow the order
+    of the writes across processes. Returns write()'s result.
+    """
+    with _history_lock():
+        result = write()
+        record_version(cells, columns)
+    return result
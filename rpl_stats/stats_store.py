@@ -0,0 +1,303 @@
+# rpl_stats/stats_store.py
+"""
+Stats schema, the daily stats table, and the saved Graphs views and chart
+colours, all kept in the shared state store (see backend.py).
+
+Importable without Streamlit, so batch jobs (lead ingestion, imports,
+exports) share the exact loading and formula code the dashboard uses.
+"""
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .backend import BASE_DIR, LEGACY_FILES, STATS, Cell, backend, merge_changes, revision
+from .formulas import apply_formulas
+
+# Legacy file locations (the "files" backend, and what a new store is seeded from)
+DATA_FILE = LEGACY_FILES[STATS]
+VIEWS_FILE = LEGACY_FILES["views"]
+COLOR_FILE = LEGACY_FILES["colors"]
+
+
+# =========================================================
+#                MASTER LIST OF ALL RPL STAT COLUMNS
+# =========================================================
+
+MASTER_STATS = [
+    # Jake
+    "New Div 4 Content", "New Div 6 Content",
+    "Div 4 - CTR", "Div 6 - CTR",
+
+    # Shiloh
+    "Weighted Digital Assets", "Innovation Counts",
+    "Automation Breaks", "Software Development Expansion Index",
+
+    # Alex
+    "Google – Simple Close – Adspend",
+    "FB – Simple Close – Adspend",
+    "FB – True Blue Homes – Adspend",
+    "Leadzolo Supplement", "Property Leads Supplement",
+    "Total Adspend",
+    "Fallback (Listed)", "Fallback (Unsold)", "Fallback (Rejected)",
+    "Total Leads", "Sellable Leads",
+    "Leads Delivered (Provisional)",
+    "Leads Delivered (Refunded)",
+    "Leads Delivered (Corrected)",
+    "VLD (Provisional)", "VLD (Refunded)", "VLD (Corrected)",
+
+    # Nick
+    "New Identities To CRM", "Total # of Identities",
+    "Outflow", "# Leads Bought", "New Clients",
+    "Active Clients", "Finished Packages", "Resigns",
+    "Churn %", "Gross Income",
+
+    # James
+    "CAC", "Total Profit", "Profit Margin %",
+]
+
+STATS_BY_OWNER = {
+    "Jake": [
+        "New Div 4 Content", "New Div 6 Content",
+        "Div 4 - CTR", "Div 6 - CTR",
+    ],
+    "Shiloh": [
+        "Weighted Digital Assets", "Innovation Counts",
+        "Automation Breaks", "Software Development Expansion Index",
+    ],
+    "Alex": [
+        "Google – Simple Close – Adspend",
+        "FB – Simple Close – Adspend",
+        "FB – True Blue Homes – Adspend",
+        "Leadzolo Supplement", "Property Leads Supplement",
+        "Total Adspend",
+        "Fallback (Listed)", "Fallback (Unsold)", "Fallback (Rejected)",
+        "Total Leads", "Sellable Leads",
+        "Leads Delivered (Provisional)", "Leads Delivered (Refunded)",
+        "Leads Delivered (Corrected)",
+        "VLD (Provisional)", "VLD (Refunded)", "VLD (Corrected)",
+    ],
+    "Nick": [
+        "New Identities To CRM", "Total # of Identities",
+        "Outflow", "# Leads Bought", "New Clients",
+        "Active Clients", "Finished Packages", "Resigns",
+        "Churn %", "Gross Income",
+    ],
+    "James": [
+        "CAC", "Total Profit", "Profit Margin %",
+        "VLD (Corrected)",
+    ],
+}
+
+
+# =========================================================
+#                   STAT NAMES / VALUES
+# =========================================================
+
+def canonical_stat_name(name: str) -> str:
+    """Lookup key that ignores case, padding and dash style ('–' vs '-')."""
+    key = str(name).replace("–", "-").replace("—", "-").lower()
+    return " ".join(key.split())
+
+
+def to_numeric_stat(s: pd.Series) -> pd.Series:
+    """Float column from numbers or text like '$1,200.50' / '12%'."""
+    if pd.api.types.is_numeric_dtype(s):
+        return s.astype(float)
+    cleaned = s.astype("string").str.replace(r"[$,%\s]", "", regex=True)
+    return pd.to_numeric(cleaned, errors="coerce").astype(float)
+
+
+# =========================================================
+#                DATA LOAD / SAVE FUNCTIONS
+# =========================================================
+
+def ensure_daily_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Ensures all dates from min → today exist in the dataframe."""
+    if "Date" not in df.columns:
+        return df
+
+    if df.empty:
+        today = datetime.today().date()
+        return pd.DataFrame({"Date": [pd.to_datetime(today)]})
+
+    df = df.sort_values("Date")
+    min_date = df["Date"].min().date()
+    max_date = df["Date"].max().date()
+    today = datetime.today().date()
+    end = max(max_date, today)
+
+    full_range = pd.date_range(start=min_date, end=end, freq="D")
+    base = pd.DataFrame({"Date": full_range})
+
+    return base.merge(df, on="Date", how="left")
+
+
+def read_stats() -> pd.DataFrame:
+    """Reads the stats table as stored (formula columns as last saved)."""
+    df = backend().read_stats()
+    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+    return df
+
+
+def load_data() -> pd.DataFrame:
+    """Loads local CSV → ensures structure → applies formulas."""
+    df = ensure_daily_rows(read_stats())
+
+    # Ensure every master stat exists
+    for col in MASTER_STATS:
+        if col not in df.columns:
+            df[col] = None
+
+    # 🔥 APPLY FORMULAS
+    df = apply_formulas(df)
+
+    return df
+
+
+def data_digest(df: pd.DataFrame, rows: List[int] | None = None) -> int:
+    """
+    Position-weighted sum (mod 2**64) of the row content hashes of `df`, or
+    of just `rows`; one row's change moves it by that row's terms only.
+    """
+    part = df if rows is None else df.iloc[rows]
+    positions = np.arange(len(df)) if rows is None else np.asarray(rows)
+    hashes = pd.util.hash_pandas_object(part, index=False).to_numpy()
+    weights = 2 * positions.astype(np.uint64) + np.uint64(1)
+    return int((hashes * weights).sum(dtype=np.uint64))
+
+
+def update_data_digest(digest: int, old: pd.DataFrame, new: pd.DataFrame, rows: List[int]) -> int:
+    """data_digest(new) from data_digest(old) when only `rows` differ (same columns / dtypes)."""
+    return (digest - data_digest(old, rows) + data_digest(new, rows)) % 2 ** 64
+
+
+def data_version_key(digest: int, columns) -> str:
+    """Cache key for a frame with `columns` and data_digest `digest`."""
+    h = hashlib.sha1(digest.to_bytes(8, "little"))
+    h.update("|".join(map(str, columns)).encode())
+    return h.hexdigest()[:16]
+
+
+def compute_data_version(df: pd.DataFrame) -> str:
+    """Content hash of the stats frame, used as a cache key across sessions."""
+    return data_version_key(data_digest(df), df.columns)
+
+
+def _by_date(df: pd.DataFrame) -> pd.DataFrame:
+    """Stat columns indexed by 'YYYY-MM-DD' (one row per date)."""
+    df = df.dropna(subset=["Date"]).drop_duplicates("Date", keep="last")
+    dates = pd.to_datetime(df["Date"]).dt.strftime("%Y-%m-%d")
+    return df.drop(columns="Date").set_axis(pd.Index(dates, name="Date"), axis=0)
+
+
+def _stored_value(value, float_format: str | None):
+    if pd.isna(value):
+        return None
+    if isinstance(value, (float, np.floating)):
+        return float(float_format % value) if float_format else float(value)
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def changed_cells(base: pd.DataFrame, df: pd.DataFrame,
+                  float_format: str | None = None) -> List[Cell]:
+    """Cells of `df` that differ from `base` (dates / columns missing from `df` are left alone)."""
+    new = _by_date(df)
+    old = _by_date(base).reindex(index=new.index, columns=new.columns)
+    a, b = old.to_numpy(dtype=object), new.to_numpy(dtype=object)
+    rows, cols = np.nonzero(~((a == b) | (pd.isna(a) & pd.isna(b))))
+    return [
+        (new.index[i], new.columns[j], _stored_value(b[i, j], float_format))
+        for i, j in zip(rows, cols)
+    ]
+
+
+def save_data(df: pd.DataFrame, float_format: str | None = None,
+              base: pd.DataFrame | None = None, rows: List[int] | None = None) -> int | None:
+    """
+    Writes the cells of `df` that differ from `base` — the frame the caller
+    started editing from — so concurrent writers to other cells aren't
+    overwritten (against the stored table when `base` is None). `rows` are
+    the only positions that can differ (as apply_cell_edits reports them);
+    then nothing else is compared. Records the change in the snapshot
+    history (see snapshots.py) and returns the new stats revision, or None
+    when nothing changed.
+    """
+    # Imported here: snapshots builds on this module
+    from .snapshots import VERSIONS_FILE, record_baseline, record_write
+
+    store = backend()
+    if store.revisions().get(STATS) and not VERSIONS_FILE.exists():
+        # Keep the pre-versioning table reachable as version 1, a second
+        # before this save so "as of" lookups can tell the two apart
+        record_baseline(read_stats, pd.Timestamp.now().floor("s") - pd.Timedelta(seconds=1))
+
+    if rows is not None:
+        cells = changed_cells(base.iloc[rows], df.iloc[rows], float_format)
+    else:
+        cells = changed_cells(read_stats() if base is None else base, df, float_format)
+    if not cells:
+        return None
+    columns = [c for c in df.columns if c != "Date"]
+    return record_write(lambda: store.write_cells(cells, columns), cells, columns)
+
+
+def data_revision() -> int:
+    """Revision of the stored stats table (bumped by every write, from any process)."""
+    return revision(STATS)
+
+
+# =========================================================
+#                      SAVED VIEWS
+# =========================================================
+
+def load_saved_views() -> dict:
+    """{view name: {"graphs": [...]}} as saved from the Graphs page."""
+    return backend().read_document("views")
+
+
+def save_saved_views(views: dict, base: dict | None = None) -> Tuple[dict, int]:
+    """
+    Saves the views changed since `base` (replaces them all when None),
+    keeping views other sessions saved meanwhile. Returns (stored views,
+    revision).
+    """
+    if base is None:
+        return backend().update_document("views", lambda current: views)
+    return backend().update_document("views", lambda current: merge_changes(current, base, views))
+
+
+# =========================================================
+#                      CHART COLOURS
+# =========================================================
+
+DEFAULT_PALETTE = [
+    "#FF4B4B", "#FF9F1C", "#FFEA00", "#4ECDC4", "#1E90FF",
+    "#2ECC71", "#9B59B6", "#E67E22", "#F1C40F", "#16A085"
+]
+
+
+def load_colors(columns: List[str]) -> Dict[str, str]:
+    """Loads chart color assignments."""
+    c = backend().read_document("colors")
+
+    idx = 0
+    for col in columns:
+        if col == "Date":
+            continue
+        if col not in c:
+            c[col] = DEFAULT_PALETTE[idx % len(DEFAULT_PALETTE)]
+            idx += 1
+    return c
+
+
+def save_colors(colors: Dict[str, str]) -> Tuple[Dict[str, str], int]:
+    """Adds / updates `colors` in the stored assignments; (stored colours, revision)."""
+    def add(current: Dict[str, str]) -> Dict[str, str] | None:
+        if all(current.get(k) == v for k, v in colors.items()):
+            return None  # nothing new: no write, no revision bump
+        return {**current, **colors}
+
+    return backend().update_document("colors", add)
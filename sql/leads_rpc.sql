@@ -0,0 +1,48 @@
+-- Server-side aggregates for the dashboard's Live Leads panel.
+-- Run once in the Supabase SQL editor; exposed through PostgREST as
+-- /rpc/lead_counts and /rpc/lead_filter_options.
+
+-- Lead counts per day, or per week ending Thursday (pandas "W-THU"),
+-- optionally only up to a `created` cursor (until_ts, inclusive).
+drop function if exists lead_counts(date, date, text[], text[], text);
+create or replace function lead_counts(
+    start_date date default null,
+    end_date   date default null,
+    statuses   text[] default null,
+    sources    text[] default null,
+    bucket     text default 'day',
+    until_ts   timestamptz default null
+)
+returns table (period date, leads bigint)
+language sql
+stable
+as $$
+    select
+        case
+            when bucket = 'week'
+                then created::date + ((4 - extract(isodow from created)::int + 7) % 7)
+            else created::date
+        end as period,
+        count(*) as leads
+    from leads
+    where (start_date is null or created >= start_date)
+      and (end_date   is null or created <  end_date + 1)
+      and (statuses   is null or status = any(statuses))
+      and (sources    is null or source = any(sources))
+      and (until_ts   is null or created <= until_ts)
+    group by 1
+    order by 1;
+$$;
+
+-- Distinct filter values, as (field, value) rows.
+create or replace function lead_filter_options()
+returns table (field text, value text)
+language sql
+stable
+as $$
+    select distinct 'status', status from leads where status is not null
+    union all
+    select distinct 'source', source from leads where source is not null;
+$$;
+
+create index if not exists leads_created_idx on leads (created);